@@ -0,0 +1,65 @@
+"""
+Бенчмарк дискового кэша выписок: разбор файла против чтения записи кэша, полностью и с ленивыми подсекциями
+
+StatementCache не трогает сборщик мусора, так как это состояние всего процесса. При чтении записи создаются сотни
+тысяч объектов без циклических ссылок, и проходы сборщика занимают заметную долю времени, поэтому отдельно
+показано чтение, на время которого вызывающий код сам отключает сборщик.
+
+    python benchmarks/bench_cache.py [количество документов]
+"""
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c import Statement
+from client_bank_exchange_1c.cache import StatementCache
+
+from generate_statement import StatementGenerator
+
+
+def measure(function) -> float:
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+
+def without_gc(function):
+    def wrapper():
+        gc.disable()
+        try:
+            return function()
+        finally:
+            gc.enable()
+
+    return wrapper
+
+
+def main(count=30000):
+    directory = tempfile.mkdtemp(prefix='bench_cache_')
+    try:
+        filename = os.path.join(directory, 'statement.txt')
+        StatementGenerator(documents=count).write(filename)
+        cache = StatementCache(os.path.join(directory, 'cache'))
+        cache.from_file(filename)
+
+        parse = measure(lambda: Statement.from_file(filename))
+        print(f'{"from_file":28} {parse:8.3f} с')
+        for title, function in (
+                ('кэш', lambda: cache.from_file(filename)),
+                ('кэш, без сборщика мусора', without_gc(lambda: cache.from_file(filename))),
+                ('кэш, lazy', lambda: cache.from_file(filename, lazy=True)),
+        ):
+            seconds = measure(function)
+            print(f'{title:28} {seconds:8.3f} с {parse / seconds:6.1f}x')
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,57 @@
+"""
+Бенчмарк преобразований Cast: текущие реализации против прежних на strptime и цепочке re.sub/replace
+
+    python benchmarks/bench_cast.py [количество повторов]
+"""
+import os
+import re
+import sys
+import timeit
+from datetime import datetime
+from decimal import Decimal
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Cast, DATE_FORMAT, TIME_FORMAT
+
+DATES = [f'{day:02}.{month:02}.2018' for month in range(1, 4) for day in range(1, 29)]
+TIMES = [f'{hour:02}:{minute:02}:00' for hour in range(9, 18) for minute in range(0, 60, 5)]
+AMOUNTS = ['200.25', '1000', '15000.00', "1'250.50", '1 000,50', '73.1']
+
+
+def strptime_date(obj):
+    return datetime.strptime(obj, DATE_FORMAT).date()
+
+
+def strptime_time(obj):
+    return datetime.strptime(obj, TIME_FORMAT).time()
+
+
+def replace_amount(obj):
+    return Decimal(
+        re.sub(r'[^0-9,.\-]', '', str(obj))
+            .replace("'", '')
+            .replace(' ', '')
+            .replace(',', '.')
+            .replace('.', '', obj.count('.') - 1)
+    )
+
+
+def main(number=200):
+    cases = [
+        ('str_to_date', DATES, strptime_date, Cast.str_to_date),
+        ('str_to_time', TIMES, strptime_time, Cast.str_to_time),
+        ('str_to_amount', AMOUNTS, replace_amount, Cast.str_to_amount),
+    ]
+    for title, values, old, new in cases:
+        assert [old(value) for value in values] == [new(value) for value in values]
+        results = []
+        for func in (old, new):
+            seconds = min(timeit.repeat(lambda: [func(value) for value in values], number=number, repeat=3))
+            results.append(seconds / number / len(values) * 1e6)
+        print(f'{title:15} было {results[0]:6.2f} мкс, стало {results[1]:6.2f} мкс')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
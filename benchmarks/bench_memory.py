@@ -0,0 +1,59 @@
+"""
+Бенчмарк памяти: байт на разобранный платежный документ
+
+Сравнивает документы из секций со __slots__ с их копиями в классах без __slots__, экземпляры которых хранят
+аттрибуты в __dict__ (так секции были устроены раньше). Значения полей у копий общие с исходными документами.
+
+    python benchmarks/bench_memory.py [количество документов]
+"""
+import os
+import sys
+import tracemalloc
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c import Document
+
+from bench_section import DOCUMENT_TEXT
+
+
+# Классы без __slots__ с теми же именами, экземпляры которых хранят аттрибуты в __dict__, как до __slots__
+DICT_CLASSES = {
+    section: type(section.__name__, (), {})
+    for section in (Document, *Document.Subsections.to_dict().values())
+}
+
+
+def to_dict_backed(section):
+    """Копия секции в __dict__; аттрибуты задаются в порядке схемы, как в конструкторе секции"""
+    if section is None:
+        return None
+    copy = DICT_CLASSES[type(section)]()
+    for name in type(section).__slots__:
+        value = getattr(section, name)
+        setattr(copy, name, to_dict_backed(value) if type(value) in DICT_CLASSES else value)
+    return copy
+
+
+def measure(count, dict_backed=False):
+    texts = [DOCUMENT_TEXT.replace('Номер=15', f'Номер={number}') for number in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    documents = [Document.from_section_text(text) for text in texts]
+    if dict_backed:
+        # Значения полей те же объекты, поэтому разница только в устройстве секций
+        documents = [to_dict_backed(document) for document in documents]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(documents) == count
+    return (after - before) / count
+
+
+def main(count=10000):
+    for title, dict_backed in (('__dict__', True), ('__slots__', False)):
+        print(f'{title:10} {measure(count, dict_backed):8.0f} байт/документ')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
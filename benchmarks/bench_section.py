@@ -0,0 +1,73 @@
+"""
+Микро-бенчмарк разбора и сериализации одного платежного документа
+
+Сравнивает построение секций по Schema.to_dict() с поиском каждого поля регулярным выражением (как было до
+таблиц полей) с разбором через таблицу полей класса, построенную при его создании.
+
+    python benchmarks/bench_section.py [количество повторов]
+"""
+import os
+import sys
+import timeit
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c import Document
+
+DOCUMENT_TEXT = '''СекцияДокумент=Платежное поручение
+Номер=15
+Дата=05.02.2018
+Сумма=200.25
+ПлательщикСчет=40702810000000000001
+ДатаСписано=05.02.2018
+Плательщик=ИНН 7700000000 ООО Ромашка
+ПлательщикИНН=7700000000
+Плательщик1=ООО Ромашка
+ПлательщикРасчСчет=40702810000000000001
+ПлательщикБанк1=ПАО СБЕРБАНК
+ПлательщикБанк2=г. Москва
+ПлательщикБИК=044525225
+ПлательщикКорсчет=30101810400000000225
+ПолучательСчет=40702810900000000009
+Получатель=ИНН 7800000000 ООО Лютик
+ПолучательИНН=7800000000
+Получатель1=ООО Лютик
+ПолучательРасчСчет=40702810900000000009
+ПолучательБанк1=АО АЛЬФА-БАНК
+ПолучательБанк2=г. Москва
+ПолучательБИК=044525593
+ПолучательКорсчет=30101810200000000593
+ВидОплаты=01
+НазначениеПлатежа=Оплата по счету 1 НДС не облагается
+Очередность=5
+'''
+
+
+def parse_by_schema(section_text):
+    def build(section):
+        obj = section()
+        for key, field in section.Schema.to_dict().items():
+            setattr(obj, key, field.get_value_from_text(section_text))
+        return obj
+
+    document = build(Document)
+    for name, section in Document.Subsections.to_dict().items():
+        setattr(document, name, build(section))
+    return document
+
+
+def main(number=2000):
+    document = Document.from_section_text(DOCUMENT_TEXT)
+    cases = [
+        ('from_text, Schema.to_dict + regex', lambda: parse_by_schema(DOCUMENT_TEXT)),
+        ('from_text, таблица полей', lambda: Document.from_section_text(DOCUMENT_TEXT)),
+        ('to_text', lambda: document.to_text()),
+    ]
+    for title, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print(f'{title:40} {seconds / number * 1e6:8.1f} мкс/документ')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,143 @@
+"""
+Бенчмарк горячих путей на синтетических выписках разного размера
+
+Для каждого размера генерируется файл (см. generate_statement.py), затем каждый этап запускается в отдельном
+процессе, чтобы пиковый RSS относился к этому этапу, а не к предыдущим. Этапы:
+
+* from_file, from_text, iter_documents - разбор
+* to_text - сериализация с проверкой обязательных полей
+* total_amount
+* from_document, to_document - конвертация в модель Django и обратно, если установлен django
+
+Пиковый RSS включает подготовку этапа, например для to_text - разбор файла.
+
+    python benchmarks/bench_statement.py [количество документов ...]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c import Statement
+
+from generate_statement import StatementGenerator
+
+SIZES = (1000, 100000, 1000000)
+
+
+def peak_rss() -> int:
+    """Пиковый RSS текущего процесса в байтах"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def get_django_document():
+    """
+    Конкретная модель на основе абстрактной DjangoDocument, без базы данных
+
+    :return: класс модели или None, если django не установлен
+    """
+    try:
+        import django
+        from django.conf import settings
+    except ImportError:
+        return None
+
+    settings.configure(INSTALLED_APPS=['django.contrib.contenttypes'], USE_TZ=False)
+    django.setup()
+    from client_bank_exchange_1c.django_client_bank_exchange_1c import DjangoDocument
+
+    class BenchDocument(DjangoDocument):
+        class Meta:
+            app_label = 'contenttypes'
+
+    return BenchDocument
+
+
+def run_phase(phase: str, filename: str):
+    """
+    Выполняет этап в текущем процессе
+
+    :return: пара (количество документов, секунды) или None, если этап недоступен
+    """
+    if phase == 'from_file':
+        started = time.perf_counter()
+        count = Statement.from_file(filename).count()
+        return count, time.perf_counter() - started
+
+    if phase == 'from_text':
+        with open(filename, encoding='cp1251') as file:
+            text = file.read()
+        started = time.perf_counter()
+        count = Statement.from_text(text).count()
+        return count, time.perf_counter() - started
+
+    if phase == 'iter_documents':
+        started = time.perf_counter()
+        with Statement.iter_documents(filename) as reader:
+            count = sum(1 for _ in reader)
+        return count, time.perf_counter() - started
+
+    if phase in ('from_document', 'to_document'):
+        model = get_django_document()
+        if model is None:
+            return None
+
+    statement = Statement.from_file(filename)
+    started = time.perf_counter()
+    if phase == 'to_text':
+        statement.to_text()
+    elif phase == 'total_amount':
+        statement.total_amount()
+    elif phase == 'from_document':
+        for document in statement.documents:
+            model.from_document(document)
+    elif phase == 'to_document':
+        instances = [model.from_document(document) for document in statement.documents]
+        started = time.perf_counter()
+        for instance in instances:
+            instance.to_document()
+    else:
+        raise ValueError(f'Неизвестный этап {phase}')
+    return statement.count(), time.perf_counter() - started
+
+
+PHASES = ('from_file', 'from_text', 'iter_documents', 'to_text', 'total_amount', 'from_document', 'to_document')
+
+
+def child(phase: str, filename: str):
+    result = run_phase(phase, filename)
+    print(json.dumps(None if result is None else {'count': result[0], 'seconds': result[1], 'rss': peak_rss()}))
+
+
+def main(*sizes):
+    directory = tempfile.mkdtemp(prefix='bench_statement_')
+    print(f'{"документов":>10} {"этап":15} {"секунд":>9} {"док/с":>11} {"пик RSS, МБ":>12}')
+    for size in sizes or SIZES:
+        filename = os.path.join(directory, f'{size}.txt')
+        StatementGenerator(documents=size).write(filename)
+        for phase in PHASES:
+            output = subprocess.run([sys.executable, __file__, '--phase', phase, filename], check=True,
+                                    stdout=subprocess.PIPE, universal_newlines=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            if result is None:
+                print(f'{size:10} {phase:15} {"нет django":>9}')
+                continue
+            assert result['count'] == size
+            print(f'{size:10} {phase:15} {result["seconds"]:9.3f} {size / result["seconds"]:11.0f} '
+                  f'{result["rss"] / (1 << 20):12.1f}')
+        os.unlink(filename)
+    os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--phase']:
+        child(*sys.argv[2:4])
+    else:
+        main(*map(int, sys.argv[1:]))
@@ -0,0 +1,297 @@
+"""
+Генератор синтетических выписок 1CClientBankExchange для бенчмарков
+
+Документы собираются из Document, Payer, Receiver, Payment, Tax и Special и записываются через Statement, поэтому
+файл совпадает с тем, что выдает сама библиотека. Генерация детерминирована: одинаковые параметры и seed дают
+одинаковый файл. Документы не хранятся в памяти целиком, так что можно генерировать выписки на миллионы документов.
+
+    python benchmarks/generate_statement.py файл [--documents N] [--accounts N] [--tax-share 0.1] [--fill-rate 0.5]
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+# Запуск скрипта из каталога репозитория без установки пакета
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from client_bank_exchange_1c import Balance, Document, Header, Payer, Payment, Receipt, Receiver, Special, Statement, \
+    Tax
+from client_bank_exchange_1c.client_bank_exchange_1c import Cast
+from client_bank_exchange_1c.validation import INN_10_WEIGHTS, account_control_key, inn_checksum
+
+
+class Bank(NamedTuple):
+    bic: str
+    corr_account: str
+    name: str
+    city: str
+
+
+class Company(NamedTuple):
+    name: str
+    inn: str
+    kpp: str
+    account: str
+    bank: Bank
+
+
+BANKS = (
+    Bank('044525225', '30101810400000000225', 'ПАО СБЕРБАНК', 'г. Москва'),
+    Bank('044525593', '30101810200000000593', 'АО АЛЬФА-БАНК', 'г. Москва'),
+    Bank('044525187', '30101810700000000187', 'Банк ВТБ (ПАО)', 'г. Москва'),
+    Bank('044030653', '30101810500000000653', 'СЕВЕРО-ЗАПАДНЫЙ БАНК ПАО СБЕРБАНК', 'г. Санкт-Петербург'),
+    Bank('046577674', '30101810500000000674', 'УРАЛЬСКИЙ БАНК ПАО СБЕРБАНК', 'г. Екатеринбург'),
+)
+TREASURY_BANK = Bank('004525988', '40102810545370000003', 'ГУ БАНКА РОССИИ ПО ЦФО//УФК ПО Г. МОСКВЕ', 'г. Москва')
+TREASURY = Company(
+    'УФК по г. Москве (ИФНС России № 1 по г. Москве)', '7701107259', '770101001',
+    account_control_key('03100643000000017300', TREASURY_BANK.bic), TREASURY_BANK,
+)
+NAMES = ('Ромашка', 'Лютик', 'Василек', 'Одуванчик', 'Колокольчик', 'Незабудка', 'Подснежник', 'Ландыш')
+FORMS = ('ООО', 'АО', 'ПАО', 'ИП')
+PURPOSES = (
+    'Оплата по счету {number} от {date} НДС не облагается',
+    'Оплата по договору {number} от {date}, в т.ч. НДС 20%',
+    'Возврат излишне перечисленных средств по счету {number}',
+    'Оплата за услуги связи по счету {number} от {date}',
+)
+KBK = ('18210102010011000110', '18210301000011000110', '18210202010061010160')
+
+
+class StatementGenerator:
+    """
+    Синтетическая выписка по нескольким счетам организации
+
+    :param documents: количество документов
+    :param accounts: количество собственных счетов, по каждому выводится секция остатков
+    :param tax_share: доля налоговых платежей среди списаний, у них заполнена подсекция Tax
+    :param fill_rate: вероятность заполнения необязательных полей
+    :param seed: начальное значение генератора случайных чисел
+    """
+
+    DOCUMENT_TYPE = 'Платежное поручение'
+
+    def __init__(self, documents: int = 1000, accounts: int = 3, tax_share: float = 0.1, fill_rate: float = 0.5,
+                 seed: int = 0, date_since: date = date(2018, 1, 1), days: int = 90):
+        self.documents = documents
+        self.tax_share = tax_share
+        self.fill_rate = fill_rate
+        self.seed = seed
+        self.date_since = date_since
+        self.date_till = date_since + timedelta(days=days - 1)
+
+        rnd = random.Random(seed)
+        self.owner = self.make_company(rnd, 'Ромашка-Холдинг', 'ООО')
+        self.accounts = []
+        for index in range(accounts):
+            bank = BANKS[index % len(BANKS)]
+            self.accounts.append(self.owner._replace(account=self.make_account(rnd, index, bank), bank=bank))
+        self.counterparties = [
+            self.make_company(rnd, rnd.choice(NAMES), rnd.choice(FORMS))
+            for _ in range(max(10, min(documents // 10, 5000)))
+        ]
+
+    @staticmethod
+    def make_account(rnd: random.Random, index: int, bank: Bank) -> str:
+        """
+        Расчетный счет с контрольным ключом, верным для БИК банка
+        """
+        return account_control_key(f'40702810{rnd.randrange(10 ** 11):011}{index % 10}', bank.bic)
+
+    @staticmethod
+    def make_inn(rnd: random.Random) -> str:
+        """
+        ИНН организации с верным контрольным разрядом
+        """
+        inn = f'{rnd.randrange(10 ** 8, 10 ** 9):09}'
+        return inn + str(inn_checksum(inn, INN_10_WEIGHTS))
+
+    def make_company(self, rnd: random.Random, name: str, form: str) -> Company:
+        inn = self.make_inn(rnd)
+        bank = rnd.choice(BANKS)
+        return Company(f'{form} {name}', inn, inn[:4] + '01001', self.make_account(rnd, rnd.randrange(10), bank), bank)
+
+    def filled(self, rnd: random.Random, value):
+        return value if rnd.random() < self.fill_rate else None
+
+    def make_payer(self, rnd: random.Random, company: Company, charged: date) -> Payer:
+        return Payer(
+            account=company.account,
+            date_charged=charged,
+            name=f'ИНН {company.inn} {company.name}',
+            inn=company.inn,
+            l1_name=company.name,
+            l2_account_number=self.filled(rnd, company.account),
+            l3_bank=self.filled(rnd, company.bank.name),
+            l4_city=self.filled(rnd, company.bank.city),
+            account_number=company.account,
+            bank_1_name=company.bank.name,
+            bank_2_city=company.bank.city,
+            bank_bic=company.bank.bic,
+            bank_corr_account=company.bank.corr_account,
+        )
+
+    def make_receiver(self, rnd: random.Random, company: Company, received: date) -> Receiver:
+        return Receiver(
+            account=company.account,
+            date_received=Cast.date_to_str(received) if received else None,
+            name=f'ИНН {company.inn} {company.name}',
+            inn=company.inn,
+            l1_name=company.name,
+            l2_account_number=self.filled(rnd, company.account),
+            l3_bank=self.filled(rnd, company.bank.name),
+            l4_city=self.filled(rnd, company.bank.city),
+            account_number=company.account,
+            bank_1_name=company.bank.name,
+            bank_2_city=company.bank.city,
+            bank_bic=company.bank.bic,
+            bank_corr_account=company.bank.corr_account,
+        )
+
+    def make_tax(self, rnd: random.Random, payer: Company, day: date) -> Tax:
+        return Tax(
+            originator_status='01',
+            payer_kpp=payer.kpp,
+            receiver_kpp=TREASURY.kpp,
+            kbk=rnd.choice(KBK),
+            okato='45000000',
+            basis='ТП',
+            period=f'МС.{day.month:02}.{day.year}',
+            number='0',
+            date='0',
+            type=self.filled(rnd, '0'),
+        )
+
+    def iter_entries(self) -> Iterator[Tuple[Document, Company, bool]]:
+        """
+        Документы выписки вместе со счетом организации и направлением платежа
+
+        :return: генератор троек (документ, собственный счет, списание)
+        """
+        rnd = random.Random(self.seed + 1)
+        days = (self.date_till - self.date_since).days + 1
+
+        for index in range(self.documents):
+            own = rnd.choice(self.accounts)
+            day = self.date_since + timedelta(days=index * days // max(self.documents, 1))
+            number = str(rnd.randrange(1, 100000))
+            expense = rnd.random() < 0.5
+            tax = expense and rnd.random() < self.tax_share
+            other = TREASURY if tax else rnd.choice(self.counterparties)
+            payer, receiver = (own, other) if expense else (other, own)
+            purpose = rnd.choice(PURPOSES).format(number=number, date=Cast.date_to_str(day))
+
+            document = Document(
+                document_type=self.DOCUMENT_TYPE,
+                number=number,
+                date=day,
+                amount=Decimal(rnd.randrange(100, 10 ** 9)).scaleb(-2),
+                receipt=self.filled(rnd, Receipt(date=day, time=time(rnd.randrange(9, 18), rnd.randrange(60)),
+                                                 content='Исполнен')),
+                payer=self.make_payer(rnd, payer, day if expense else None),
+                receiver=self.make_receiver(rnd, receiver, None if expense else day),
+                payment=Payment(
+                    payment_type=self.filled(rnd, 'электронно'),
+                    operation_type='01',
+                    code=self.filled(rnd, '0'),
+                    purpose=purpose,
+                    purpose_l1=self.filled(rnd, purpose[:60]),
+                ),
+                tax=self.make_tax(rnd, payer, day) if tax else None,
+                special=Special(
+                    priority='3' if tax else '5',
+                    maturity=self.filled(rnd, Cast.date_to_str(day)),
+                    extra_conditions=self.filled(rnd, 'нет'),
+                ),
+            )
+            yield document, own, expense
+
+    def iter_documents(self) -> Iterator[Document]:
+        return (document for document, _, _ in self.iter_entries())
+
+    def get_header(self) -> Header:
+        return Header(
+            format_version='1.02',
+            encoding='Windows',
+            sender='Бухгалтерия предприятия',
+            receiver='Клиент-Банк',
+            creation_date=self.date_till + timedelta(days=1),
+            creation_time=time(9, 0),
+            filter_date_since=self.date_since,
+            filter_date_till=self.date_till,
+            filter_account_numbers=[company.account for company in self.accounts],
+            filter_document_types=[self.DOCUMENT_TYPE],
+        )
+
+    def get_balances(self) -> List[Balance]:
+        """
+        Остатки по каждому счету, сходящиеся с документами: начальный + поступления - списания = конечный.
+        Требует отдельного прохода по документам
+        """
+        rnd = random.Random(self.seed + 2)
+        totals: Dict[str, List[Decimal]] = {company.account: [Decimal('0.00'), Decimal('0.00')]
+                                            for company in self.accounts}
+        for document, own, expense in self.iter_entries():
+            totals[own.account][expense] += document.amount
+
+        balances = []
+        for company in self.accounts:
+            income, expense = totals[company.account]
+            initial = Decimal(rnd.randrange(10 ** 6, 10 ** 10)).scaleb(-2)
+            balances.append(Balance(
+                date_since=self.date_since,
+                date_till=self.date_till,
+                account_number=company.account,
+                initial_balance=initial,
+                total_income=income,
+                total_expense=expense,
+                final_balance=initial + income - expense,
+            ))
+        return balances
+
+    def get_statement(self, documents: bool = True) -> Statement:
+        """
+        Выписка целиком в памяти
+
+        :param documents: заполнить документы списком; иначе documents - генератор для однократной записи
+        :return: Statement
+        """
+        return Statement(
+            header=self.get_header(),
+            balances=self.get_balances(),
+            documents=list(self.iter_documents()) if documents else self.iter_documents(),
+        )
+
+    def write(self, filename: str, encoding: str = 'cp1251'):
+        """
+        Записывает выписку в файл, не собирая документы в памяти
+
+        :param filename: путь к файлу
+        :param encoding: кодировка файла
+        """
+        statement = self.get_statement(documents=False)
+        with open(filename, 'wb') as file:
+            statement.write_to(file, encoding=encoding)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('filename')
+    parser.add_argument('--documents', type=int, default=1000)
+    parser.add_argument('--accounts', type=int, default=3)
+    parser.add_argument('--tax-share', type=float, default=0.1)
+    parser.add_argument('--fill-rate', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    StatementGenerator(args.documents, args.accounts, args.tax_share, args.fill_rate, args.seed).write(args.filename)
+    print(f'{args.filename}: {args.documents} документов за {(datetime.now() - started).total_seconds():.1f} с')
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,9 @@
 
 __author__ = """Denis Kim"""
 __email__ = 'denis@kim.aero'
-__version__ = '0.1.8'
+__version__ = '0.2.0'
 
 from .client_bank_exchange_1c import (
-    Statement, Header, Balance, Document, Payer, Payment, Receipt, Receiver,
-    Special, Tax,
+    Statement, StatementReader, MappedStatement, StatementStructureError, Header, Balance, Document, LazyDocument,
+    Payer, Payment, Receipt, Receiver, Special, Tax, ParseStats, instrument,
 )
@@ -0,0 +1,268 @@
+import asyncio
+import codecs
+import inspect
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Tuple
+
+from client_bank_exchange_1c.client_bank_exchange_1c import (
+    Balance, Document, Header, LazyDocument, SectionSplitter, Statement, call_instrumented, get_stats,
+)
+
+CHUNK_SIZE = 1 << 16
+
+
+class FileStream:
+    """
+    Асинхронный доступ к обычному файлу: чтение и запись выполняются в пуле потоков цикла событий
+    """
+
+    def __init__(self, file, executor: Optional[Executor] = None):
+        self.file = file
+        self.executor = executor
+
+    @classmethod
+    def open(cls, filename: str, mode: str = 'rb', executor: Optional[Executor] = None):
+        return cls(open(filename, mode), executor=executor)
+
+    async def read(self, size: int = -1) -> bytes:
+        return await asyncio.get_event_loop().run_in_executor(self.executor, self.file.read, size)
+
+    async def write(self, data: bytes):
+        await asyncio.get_event_loop().run_in_executor(self.executor, self.file.write, data)
+
+    def close(self):
+        self.file.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncStatementReader:
+    """
+    Асинхронный потоковый разбор выписки из асинхронного потока байтов: asyncio.StreamReader, FileStream или
+    асинхронного итератора частей файла
+
+    Поток делится на секции SectionSplitter в цикле событий по мере чтения, а разбор документов выполняется
+    пачками по batch_size в executor (по умолчанию пул потоков цикла событий; для разбора без GIL -
+    ProcessPoolExecutor). Пока отдаются документы одной пачки, следующая уже читается и разбирается.
+
+        async with AsyncStatementReader(stream) as reader:
+            print(reader.header.sender)
+            async for document in reader:
+                ...
+    """
+
+    def __init__(self, stream, encoding: str = 'cp1251', lazy: bool = False, fields: Optional[Iterable[str]] = None,
+                 batch_size: int = 1000, executor: Optional[Executor] = None, chunk_size: int = CHUNK_SIZE):
+        self.stream = stream
+        self.encoding = encoding
+        self.document_cls = LazyDocument if lazy else Document
+        self.fields = frozenset(fields) if fields is not None else None
+        self.batch_size = batch_size
+        self.executor = executor
+        self.chunk_size = chunk_size
+
+        self.header: Optional[Header] = None
+        self.balances: List[Balance] = []
+        self._sections = self.iter_sections()
+        self._pending: Optional[str] = None
+        self._started = False
+
+    @property
+    def balance(self) -> Optional[Balance]:
+        return self.balances[0] if self.balances else None
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        if hasattr(self.stream, 'read'):
+            while True:
+                chunk = await self.stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            async for chunk in self.stream:
+                yield chunk
+
+    @staticmethod
+    def split_lines(text: str) -> Tuple[List[str], str]:
+        """
+        Полные строки текста с переводом строки \\n и незавершенный остаток
+        """
+        *lines, rest = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        return [line + '\n' for line in lines], rest
+
+    async def iter_sections(self) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Тексты секций потока, см. SectionSplitter.push_lines
+        """
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        splitter = SectionSplitter()
+        rest = ''
+
+        async for chunk in self.iter_chunks():
+            text = rest + decoder.decode(chunk)
+            # \r в конце части может быть началом \r\n
+            hold = '\r' if text.endswith('\r') else ''
+            lines, rest = self.split_lines(text[:len(text) - len(hold)])
+            rest += hold
+            for section in list(splitter.push_lines(lines)):
+                yield section
+            if splitter.state == SectionSplitter.END:
+                return
+
+        lines, rest = self.split_lines(rest + decoder.decode(b'', final=True))
+        if rest:
+            lines.append(rest)
+        for section in list(splitter.push_lines(lines)) + list(splitter.finish_lines()):
+            yield section
+
+    def _handle(self, kind: str, text: str):
+        if kind == SectionSplitter.HEADER:
+            self.header = Header.from_found(Header.split_lines(text))
+        elif kind == SectionSplitter.BALANCE:
+            self.balances.append(Balance.from_found(Balance.split_lines(text)))
+
+    async def start(self):
+        """
+        Читает поток до первого документа: после этого доступны header и balances
+        """
+        if self._started:
+            return
+        self._started = True
+        async for kind, text in self._sections:
+            if kind == SectionSplitter.DOCUMENT:
+                self._pending = text
+                break
+            self._handle(kind, text)
+
+    def parse(self, texts: List[str], start: int) -> asyncio.Future:
+        # Сборщик статистики instrument() привязан к потоку: разбор в пуле потоков учитывается в сборщике
+        # вызывающего кода, в пул процессов он не передается
+        stats = None if isinstance(self.executor, ProcessPoolExecutor) else get_stats()
+        return asyncio.get_event_loop().run_in_executor(
+            self.executor, call_instrumented, stats, self.document_cls.from_section_texts, texts, start, self.fields
+        )
+
+    async def iter_documents(self) -> AsyncIterator[Document]:
+        await self.start()
+        texts = [] if self._pending is None else [self._pending]
+        self._pending = None
+        start = 0
+        running = None
+
+        async for kind, text in self._sections:
+            if kind != SectionSplitter.DOCUMENT:
+                self._handle(kind, text)
+                continue
+            texts.append(text)
+            if len(texts) >= self.batch_size:
+                future = self.parse(texts, start)
+                start += len(texts)
+                texts = []
+                if running is not None:
+                    for document in await running:
+                        yield document
+                running = future
+
+        if running is not None:
+            for document in await running:
+                yield document
+        if texts:
+            for document in await self.parse(texts, start):
+                yield document
+
+    def __aiter__(self):
+        return self.iter_documents()
+
+    async def read_statement(self) -> Statement:
+        """
+        Выписка целиком: заголовок, остатки и все документы потока
+        """
+        documents = [document async for document in self]
+        return Statement(header=self.header, balances=self.balances, documents=documents)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+async def read_statement(stream, encoding: str = 'cp1251', lazy: bool = False, fields: Optional[Iterable[str]] = None,
+                         batch_size: int = 1000, executor: Optional[Executor] = None) -> Statement:
+    """
+    Асинхронный аналог Statement.from_text для потока байтов, см. AsyncStatementReader
+
+    :return: Заполненный объект полного документа выписки
+    """
+    reader = AsyncStatementReader(stream, encoding=encoding, lazy=lazy, fields=fields, batch_size=batch_size,
+                                  executor=executor)
+    return await reader.read_statement()
+
+
+async def read_file(filename: str, encoding: str = 'cp1251', lazy: bool = False,
+                    fields: Optional[Iterable[str]] = None, batch_size: int = 1000,
+                    executor: Optional[Executor] = None) -> Statement:
+    """
+    Асинхронный аналог Statement.from_file: файл читается в пуле потоков, документы разбираются в executor
+
+    :return: Заполненный объект полного документа выписки
+    """
+    async with FileStream.open(filename) as stream:
+        return await read_statement(stream, encoding=encoding, lazy=lazy, fields=fields, batch_size=batch_size,
+                                    executor=executor)
+
+
+def take(iterator: Iterator[str], count: int) -> List[str]:
+    return list(islice(iterator, count))
+
+
+async def write_bytes(stream, data: bytes):
+    """
+    Запись в asyncio.StreamWriter (write и drain) или в поток с асинхронным write
+    """
+    result = stream.write(data)
+    if inspect.isawaitable(result):
+        await result
+    drain = getattr(stream, 'drain', None)
+    if drain is not None:
+        await drain()
+
+
+async def write_statement(statement: Statement, stream, encoding: str = 'cp1251', validate: bool = True,
+                          batch_size: int = 1000, executor: Optional[Executor] = None):
+    """
+    Асинхронный аналог Statement.write_to: тексты секций готовятся пачками по batch_size в пуле потоков executor,
+    а в поток пишутся из цикла событий. Результат совпадает с Statement.to_text
+
+    :param statement: выписка
+    :param stream: asyncio.StreamWriter, FileStream или поток с асинхронным write
+    :param encoding: кодировка
+    :param validate: проверять обязательные при отправке в банк аттрибуты
+    :param batch_size: количество секций в пачке
+    :param executor: пул потоков, по умолчанию пул цикла событий; генератор секций не передается в другой процесс
+    """
+    loop = asyncio.get_event_loop()
+    sections = statement.iter_text(validate=validate)
+    separator = ''
+    while True:
+        texts = await loop.run_in_executor(executor, take, sections, batch_size)
+        if not texts:
+            break
+        await write_bytes(stream, (separator + '\n\n'.join(texts)).encode(encoding))
+        separator = '\n\n'
+
+
+async def write_file(statement: Statement, filename: str, encoding: str = 'cp1251', validate: bool = True,
+                     batch_size: int = 1000, executor: Optional[Executor] = None):
+    """
+    Асинхронная запись выписки в файл, см. write_statement
+    """
+    async with FileStream.open(filename, 'wb') as stream:
+        await write_statement(statement, stream, encoding=encoding, validate=validate, batch_size=batch_size,
+                              executor=executor)
@@ -0,0 +1,362 @@
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+from array import array
+from datetime import date, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from client_bank_exchange_1c import __version__
+from client_bank_exchange_1c import client_bank_exchange_1c as parser
+from client_bank_exchange_1c.client_bank_exchange_1c import (
+    Statement, Header, Balance, Document, Section, Type, lazy_attribute,
+)
+
+# Увеличивается при изменении формата файлов кэша
+CACHE_FORMAT = 3
+CHUNK_SIZE = 1 << 20
+# Номера значений документов: 32-битные целые со знаком
+ROW_TYPECODE = 'i' if array('i').itemsize == 4 else 'l'
+
+
+def get_parser_fingerprint() -> str:
+    """
+    Отпечаток исходного текста разборщика (схемы секций, приведение типов, разбор текста) и формата кэша: любое
+    изменение разборщика меняет ключи кэша, даже если версия пакета не увеличена
+    """
+    digest = hashlib.sha1()
+    for module in (parser, sys.modules[__name__]):
+        digest.update(get_module_code(module))
+    return digest.hexdigest()
+
+
+def get_module_code(module) -> bytes:
+    """
+    Исходный текст модуля, а если его нет (установка только с .pyc, zipapp) - содержимое файла модуля через
+    загрузчик. Для замороженного приложения - пустая строка: тогда ключ кэша меняет только версия пакета
+    """
+    try:
+        return inspect.getsource(module).encode()
+    except (OSError, TypeError):
+        pass
+    try:
+        return module.__loader__.get_data(module.__file__)
+    except (AttributeError, OSError, TypeError, ValueError):
+        return b''
+
+
+def time_to_int(value: time) -> int:
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000000 + value.microsecond
+
+
+def int_to_time(value: int) -> time:
+    seconds, microsecond = divmod(value, 1000000)
+    minutes, second = divmod(seconds, 60)
+    hour, minute = divmod(minutes, 60)
+    return time(hour, minute, second, microsecond)
+
+
+# Вид значения в таблице: (проверка типа, в JSON, из JSON)
+VALUE_KINDS = {
+    'n': (lambda value: value is None, lambda value: None, lambda value: None),
+    's': (lambda value: type(value) is str, str, str),
+    'd': (lambda value: type(value) is Decimal, str, Decimal),
+    'D': (lambda value: type(value) is date, date.toordinal, date.fromordinal),
+    't': (lambda value: type(value) is time, time_to_int, int_to_time),
+    'l': (lambda value: type(value) is list, list, list),
+}
+
+
+class ValueTable:
+    """
+    Таблица различных значений полей при записи в кэш: секции хранятся списками номеров значений, поэтому
+    повторяющиеся счета, ИНН, даты и суммы записываются и приводятся к типу при чтении один раз. Формат - JSON, при
+    чтении не выполняется никакой код, в отличие от pickle
+    """
+
+    def __init__(self):
+        self.kinds: List[str] = ['n']
+        self.values: List[Any] = [None]
+        self.index: Dict[Tuple[str, Any], int] = {('n', None): 0}
+
+    def add(self, value) -> int:
+        for kind, (check, to_json, _) in VALUE_KINDS.items():
+            if check(value):
+                break
+        else:
+            raise TypeError(f'Значение {value!r} типа {type(value).__name__} не сохраняется в кэш')
+        encoded = to_json(value)
+        key = (kind, tuple(encoded) if kind == 'l' else encoded)
+        position = self.index.get(key)
+        if position is None:
+            position = self.index[key] = len(self.values)
+            self.kinds.append(kind)
+            self.values.append(encoded)
+        return position
+
+    def to_json(self) -> Dict[str, Any]:
+        return {'kinds': ''.join(self.kinds), 'values': self.values}
+
+    @staticmethod
+    def decode(data: Dict[str, Any]) -> List[Any]:
+        return [VALUE_KINDS[kind][2](value) for kind, value in zip(data['kinds'], data['values'])]
+
+
+class SectionCodec:
+    """
+    Компактное представление секции в кэше: номера значений полей в ValueTable в порядке схемы. Секция
+    восстанавливается вызовом конструктора с позиционными аргументами, если их порядок совпадает со схемой, иначе
+    именованными
+    """
+
+    def __init__(self, section: type):
+        self.section = section
+        self.attrs = tuple(field.attr for field in section.fields)
+        parameters = tuple(inspect.signature(section).parameters)
+        self.positional = parameters[:len(self.attrs)] == self.attrs
+        # Списки (поля ARRAY) копируются, чтобы секции не делили один изменяемый объект
+        self.arrays = tuple(
+            position for position, field in enumerate(section.fields) if field.field.type is Type.ARRAY
+        )
+
+    def encode(self, obj: Optional[Section], table: ValueTable) -> Optional[List[int]]:
+        if obj is None:
+            return None
+        return [table.add(getattr(obj, attr, None)) for attr in self.attrs]
+
+    def decode_values(self, positions: Iterable[int], values: List[Any]) -> List[Any]:
+        decoded = list(map(values.__getitem__, positions))
+        for position in self.arrays:
+            if type(decoded[position]) is list:
+                decoded[position] = list(decoded[position])
+        return decoded
+
+    def decode(self, positions: Optional[Iterable[int]], values: List[Any]) -> Optional[Section]:
+        if positions is None:
+            return None
+        decoded = self.decode_values(positions, values)
+        if self.positional:
+            return self.section(*decoded)
+        return self.section(**dict(zip(self.attrs, decoded)))
+
+
+class DocumentLayout:
+    """
+    Раскладка документа в строке таблицы документов кэша: поля документа, затем поля каждой подсекции. Отсутствующая
+    подсекция записывается номерами ABSENT
+    """
+
+    ABSENT = -1
+
+    def __init__(self):
+        self.document_codec = SectionCodec(Document)
+        self.subsections: List[Tuple[str, SectionCodec, int, int]] = []
+        offset = len(self.document_codec.attrs)
+        for name, section in Document.Subsections.to_dict().items():
+            codec = SectionCodec(section)
+            self.subsections.append((name, codec, offset, offset + len(codec.attrs)))
+            offset += len(codec.attrs)
+        self.width = offset
+        # Документ собирается одним вызовом конструктора, если подсекции следуют в нем сразу за полями
+        parameters = tuple(inspect.signature(Document).parameters)
+        self.positional = self.document_codec.positional and parameters[len(self.document_codec.attrs):][
+            :len(self.subsections)] == tuple(name for name, _, _, _ in self.subsections)
+
+    def encode(self, document: Document, table: ValueTable) -> List[int]:
+        row = self.document_codec.encode(document, table)
+        for name, codec, start, end in self.subsections:
+            section = getattr(document, name)
+            row += [self.ABSENT] * (end - start) if section is None else codec.encode(section, table)
+        return row
+
+    def decode_subsection(self, row: Sequence[int], values: List[Any], index: int) -> Optional[Section]:
+        _, codec, start, end = self.subsections[index]
+        if row[start] == self.ABSENT:
+            return None
+        return codec.decode(row[start:end], values)
+
+    def decode(self, row: Sequence[int], values: List[Any]) -> Document:
+        absent = self.ABSENT
+        sections = [
+            None if row[start] == absent else codec.decode(row[start:end], values)
+            for _, codec, start, end in self.subsections
+        ]
+        fields = self.document_codec.decode_values(row[:len(self.document_codec.attrs)], values)
+        if self.positional:
+            return Document(*fields, *sections)
+        document = self.document_codec.section(**dict(zip(self.document_codec.attrs, fields)))
+        for (name, _, _, _), section in zip(self.subsections, sections):
+            setattr(document, name, section)
+        return document
+
+    def decode_lazy(self, row: Sequence[int], values: List[Any]) -> 'CachedDocument':
+        document = CachedDocument.__new__(CachedDocument)
+        for attr, value in zip(self.document_codec.attrs,
+                               self.document_codec.decode_values(row[:len(self.document_codec.attrs)], values)):
+            setattr(document, attr, value)
+        document._row = row
+        document._values = values
+        return document
+
+
+class CachedDocument(Document):
+    """
+    Документ из кэша, подсекции которого восстанавливаются при первом обращении к ним, см. StatementCache.from_file
+    """
+
+    __slots__ = ('_row', '_values')
+
+
+_layout = DocumentLayout()
+
+for _index, (_name, _, _, _) in enumerate(_layout.subsections):
+    setattr(CachedDocument, _name, lazy_attribute(
+        Document.__dict__[_name],
+        lambda self, index=_index: _layout.decode_subsection(self._row, self._values, index)
+    ))
+
+del _index, _name
+
+
+class StatementCache:
+    """
+    Дисковый кэш разобранных выписок. Ключ - хэш содержимого файла вместе с версией библиотеки, форматом кэша и
+    отпечатком исходного текста разборщика, поэтому записи другой версии разборщика не используются. Размер
+    каталога ограничен max_size байт: при превышении удаляются давно не читанные записи (время доступа хранится в
+    mtime файла)
+
+    Запись - строка JSON с таблицей значений, заголовком и остатками, за которой следует массив int32 номеров
+    значений документов. При чтении не исполняется никакой код (в отличие от pickle), но подмененная запись подменит
+    данные выписки, поэтому каталог кэша должен быть доступен на запись только доверенным процессам. Поврежденная
+    или нечитаемая запись считается промахом и удаляется
+    """
+
+    SUFFIX = '.statement'
+
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        self.directory = directory
+        self.max_size = max_size
+        # Массив номеров пишется в родном порядке байт, поэтому он входит в ключ
+        self.version = f'{__version__}:{CACHE_FORMAT}:{sys.byteorder}:{get_parser_fingerprint()}'
+        self.header_codec = SectionCodec(Header)
+        self.balance_codec = SectionCodec(Balance)
+        self.layout = _layout
+        os.makedirs(directory, exist_ok=True)
+
+    def get_key(self, filename: str) -> str:
+        digest = hashlib.sha256(self.version.encode())
+        with open(filename, 'rb') as file:
+            for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.SUFFIX)
+
+    def from_file(self, filename: str, lazy: bool = False) -> Statement:
+        """
+        Выписка из кэша или, при отсутствии записи, разобранная Statement.from_file и сохраненная в кэш
+
+        :param filename: Путь к файлу
+        :param lazy: Восстанавливать подсекции документов из кэша при первом обращении (CachedDocument)
+        :return: Заполненный объект полного документа выписки
+        """
+        key = self.get_key(filename)
+        statement = self.get(key, lazy=lazy)
+        if statement is None:
+            statement = Statement.from_file(filename)
+            self.put(key, statement)
+        return statement
+
+    def get(self, key: str, lazy: bool = False) -> Optional[Statement]:
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        try:
+            statement = self.decode(data, lazy=lazy)
+        except Exception:
+            # Обрезанная, поврежденная или устаревшая запись: промах, запись будет перезаписана
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        os.utime(path)
+        return statement
+
+    def put(self, key: str, statement: Statement):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(self.encode(statement))
+            os.replace(temp_path, self.get_path(key))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        Удаляет давно не читанные записи, пока размер кэша больше max_size
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                os.unlink(os.path.join(self.directory, name))
+
+    def encode(self, statement: Statement) -> bytes:
+        table = ValueTable()
+        rows = array(ROW_TYPECODE)
+        for document in statement.documents or ():
+            rows.extend(self.layout.encode(document, table))
+        meta = {
+            'header': self.header_codec.encode(statement.header, table),
+            'balances': [self.balance_codec.encode(balance, table) for balance in statement.balances],
+            'width': self.layout.width,
+            'count': len(statement.documents or ()),
+            'table': table.to_json(),
+        }
+        return json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode() + b'\n' + rows.tobytes()
+
+    def decode(self, data: bytes, lazy: bool = False) -> Statement:
+        separator = data.index(b'\n')
+        meta = json.loads(data[:separator])
+        values = ValueTable.decode(meta['table'])
+        rows = array(ROW_TYPECODE)
+        rows.frombytes(data[separator + 1:])
+        width, count = meta['width'], meta['count']
+        if width != self.layout.width or len(rows) != width * count:
+            raise ValueError('Размер таблицы документов не совпадает с заголовком записи')
+        if rows and (min(rows) < DocumentLayout.ABSENT or max(rows) >= len(values)):
+            raise ValueError('Номер значения вне таблицы значений')
+
+        decode = self.layout.decode_lazy if lazy else self.layout.decode
+        documents = [decode(rows[start:start + width], values) for start in range(0, width * count, width)]
+        return Statement(
+            header=self.header_codec.decode(meta['header'], values),
+            balances=[self.balance_codec.decode(balance, values) for balance in meta['balances']],
+            documents=documents,
+        )
@@ -1,12 +1,26 @@
+import hashlib
+import io
+import mmap
+import os
 import re
+import sys
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from decimal import Decimal
 from datetime import date, time, datetime
 from enum import Flag, auto, Enum
-from functools import reduce
-from typing import NamedTuple, List, Callable, Pattern, AnyStr, Any, Optional
+from functools import lru_cache
+from itertools import repeat
+from time import perf_counter
+from types import MappingProxyType
+from typing import NamedTuple, List, Callable, Pattern, AnyStr, Any, Optional, Dict, Tuple, Mapping, Iterable, \
+    FrozenSet, Iterator
 
 DATE_FORMAT = '%d.%m.%Y'
 TIME_FORMAT = '%H:%M:%S'
+CAST_CACHE_SIZE = 4096
 
 
 class Required(Flag):
@@ -36,6 +50,20 @@ class Cast:
         else:
             return None
 
+    @staticmethod
+    def str_to_interned_text(obj: AnyStr) -> Optional[str]:
+        """
+        Конвертирует строку из 1CClientBankExchange в чистую интернированную строку или None: для полей, значения
+        которых повторяются в документах (счета, ИНН, БИК), чтобы они хранились в памяти один раз, см. Field.intern
+
+        :param obj: строка
+        :return: строка или None
+        """
+        if obj and obj.strip():
+            return sys.intern(obj.strip())
+        else:
+            return None
+
     @staticmethod
     def str_to_date(obj: AnyStr) -> Optional[date]:
         """
@@ -45,7 +73,7 @@ class Cast:
         :return: datetime.date
         """
         if obj:
-            return datetime.strptime(obj, DATE_FORMAT).date()
+            return parse_date(obj)
         else:
             return None
 
@@ -58,7 +86,7 @@ class Cast:
         :return: datetime.time
         """
         if obj:
-            return datetime.strptime(obj, TIME_FORMAT).time()
+            return parse_time(obj)
         else:
             return None
 
@@ -70,10 +98,11 @@ class Cast:
         :param obj: строка в формате руб[.коп]
         :return: decimal.Decimal
         """
+        if isinstance(obj, str) and AMOUNT_CLEAN_REGEX.fullmatch(obj) and obj.count('.') < 2:
+            return Decimal(obj)
+
         return Decimal(
-            re.sub(r'[^0-9,.\-]', '', str(obj))
-                .replace("'", '')
-                .replace(' ', '')
+            AMOUNT_JUNK_REGEX.sub('', str(obj))
                 .replace(',', '.')
                 .replace('.', '', obj.count('.') - 1)
         )
@@ -128,6 +157,45 @@ class Cast:
         return str(obj).replace(',', '.')
 
 
+AMOUNT_CLEAN_REGEX = re.compile(r'[0-9.\-]*')
+AMOUNT_JUNK_REGEX = re.compile(r'[^0-9,.\-]')
+DATE_LAYOUT_REGEX = re.compile(r'[0-9]{2}\.[0-9]{2}\.[0-9]{4}')
+TIME_LAYOUT_REGEX = re.compile(r'[0-9]{2}:[0-9]{2}:[0-9]{2}')
+
+
+@lru_cache(maxsize=CAST_CACHE_SIZE)
+def parse_date(text: str) -> date:
+    """
+    Дата из строки *дд.мм.гггг* без strptime, строки другой раскладки разбираются strptime. Последние
+    CAST_CACHE_SIZE дат запоминаются: в выписке повторяется несколько дат
+
+    :param text: строка
+    :return: datetime.date
+    """
+    if DATE_LAYOUT_REGEX.fullmatch(text):
+        try:
+            return date(int(text[6:]), int(text[3:5]), int(text[:2]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, DATE_FORMAT).date()
+
+
+@lru_cache(maxsize=CAST_CACHE_SIZE)
+def parse_time(text: str) -> time:
+    """
+    Время из строки *чч:мм:сс* без strptime, строки другой раскладки разбираются strptime
+
+    :param text: строка
+    :return: datetime.time
+    """
+    if TIME_LAYOUT_REGEX.fullmatch(text):
+        try:
+            return time(int(text[:2]), int(text[3:5]), int(text[6:]))
+        except ValueError:
+            pass
+    return datetime.strptime(text, TIME_FORMAT).time()
+
+
 class Type(Enum):
     TEXT = FieldType(type=str, cast_from_text=Cast.str_to_text, cast_to_text=Cast.text_to_str)
     DATE = FieldType(type=date, cast_from_text=Cast.str_to_date, cast_to_text=Cast.date_to_str)
@@ -142,21 +210,105 @@ class Field(NamedTuple):
     description: str
     required: Required = Required.NONE
     type: Type = Type.TEXT
+    # Интернировать значения: только для полей с повторяющимися значениями, уникальные строки (номера, назначения
+    # платежа) иначе навсегда остаются в таблице интернированных строк интерпретатора
+    intern: bool = False
+
+    @property
+    def regex(self) -> Pattern[str]:
+        return compile_field_regex(self.key)
 
     def get_value_from_text(self, source_text: AnyStr) -> Any:
-        regex = r'^' + self.key + '=(.*?)$'
-        found = re.findall(regex, source_text, re.MULTILINE)
+        found = self.regex.findall(source_text)
+        return self.get_value_from_found(found)
+
+    def get_value_from_found(self, found: List[str]) -> Any:
+        """
+        Конвертирует найденные в тексте секции значения поля
+
+        :param found: значения всех строк *КЛЮЧ=значение* с ключом поля
+        :return: значение поля
+        """
+        return CompiledField.from_field(None, self).get_value_from_found(found)
+
+
+@lru_cache(maxsize=None)
+def compile_field_regex(key: str) -> Pattern[str]:
+    return re.compile(r'^' + key + '=(.*?)$', re.MULTILINE)
+
+
+class CompiledField(NamedTuple):
+    """
+    Поле схемы секции с заранее вычисленными для разбора и сериализации данными, строится один раз при создании
+    класса секции
+    """
+    attr: str
+    field: Field
+    key: str
+    prefix: str
+    regex: Pattern[str]
+    cast_from_text: Callable
+    cast_to_text: Callable
+    required: bool
+    is_flag: bool
+    is_array: bool
 
-        if len(found) > 1 and self.type != Type.ARRAY:
+    @classmethod
+    def from_field(cls, attr: Optional[str], field: Field):
+        return cls(
+            attr=attr,
+            field=field,
+            key=field.key,
+            prefix=field.key + '=',
+            regex=field.regex,
+            cast_from_text=(
+                Cast.str_to_interned_text if field.intern and field.type in (Type.TEXT, Type.ARRAY)
+                else field.type.value.cast_from_text
+            ),
+            cast_to_text=field.type.value.cast_to_text,
+            required=Required.TO_BANK in field.required,
+            is_flag=field.type == Type.FLAG,
+            is_array=field.type == Type.ARRAY,
+        )
+
+    def get_value_from_found(self, found: List[str]) -> Any:
+        if len(found) > 1 and not self.is_array:
             raise ValueError(f'Согласно спецификации {self.key} не может быть несколькими строками, однако найдено '
                              f'{len(found)} шт.')
 
         if not found:
             return None
-        elif self.type == Type.ARRAY and len(found) > 1:
-            return [self.type.value.cast_from_text(item) for item in found]
+        elif self.is_array and len(found) > 1:
+            return [self.cast_from_text(item) for item in found]
         else:
-            return self.type.value.cast_from_text(found[0])
+            return self.cast_from_text(found[0])
+
+    def render(self, attr, validate: bool = False) -> str:
+        """
+        Строка (для массивов - строки) поля в формате 1CClientBankExchange
+
+        :param attr: значение аттрибута секции
+        :param validate: проверять наличие обязательного при отправке в банк значения
+        :return: текст или пустая строка, если поле не нужно выводить
+        """
+        if attr and self.is_array:
+            # Единственное значение массива разбирается строкой, см. get_value_from_found
+            items = (attr,) if isinstance(attr, str) else attr
+            return '\n'.join([self.render_value(self.cast_to_text(item)) for item in items])
+
+        value = self.cast_to_text(attr)
+        if validate and not value and self.required and not self.is_flag:
+            raise ValueError(f'Обязательны при отправке в банк аттрибут {self.key} не содержит значения!')
+        return self.render_value(value)
+
+    def render_value(self, value: str) -> str:
+        if not value and not self.required:
+            return ''
+        else:
+            return self.key if self.is_flag else self.prefix + value
+
+    def validate(self, attr):
+        self.render(attr, validate=True)
 
 
 class Schema:
@@ -168,10 +320,372 @@ class Schema:
         }
 
 
+class ParseStats:
+    """
+    Время этапов разбора и сериализации и счетчики, собираются только внутри instrument()
+
+    Этапы (seconds и calls): *split* - деление файла на секции, *split_lines* - разбор строк *КЛЮЧ=значение*,
+    *from_found* - создание секций вместе с *cast* - преобразованием значений полей, *to_text* - вывод секций,
+    а также итоговые *statement.from_text*, *statement.to_text* и *document.from_text*.
+
+    Счетчики (counters): *bytes* и *chars* - объем прочитанных файлов и текстов, *sections.<вид>* - найденные
+    секции, *fields.<класс>* - заполненные поля секций, *cast_failures.<класс>.<аттрибут>* - ошибки преобразования.
+
+    Документы, разобранные в пуле процессов (workers > 1), учитываются только в итоговом времени.
+
+    Сборщик можно передать в другие потоки (см. call_instrumented), поэтому его счетчики обновляются под блокировкой.
+    """
+
+    def __init__(self, callback: Callable[[str, float], None] = None):
+        """
+        :param callback: вызывается с именем этапа и временем в секундах при каждом его завершении
+        """
+        self.callback = callback
+        self.seconds: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float):
+        with self.lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+        if self.callback is not None:
+            self.callback(stage, seconds)
+
+    def count(self, counter: str, value: int = 1):
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def fill_section(self, obj: 'Section', found: Dict[Tuple[Optional[str], str], List[str]], name: Optional[str],
+                     fields: Tuple['CompiledField', ...]) -> 'Section':
+        """
+        Вариант цикла Section.from_found с замером преобразований и подсчетом полей и ошибок
+        """
+        section = type(obj).__name__
+        started = perf_counter()
+        cast_seconds = 0.0
+        parsed = 0
+        for field in fields:
+            values = found.get((name, field.attr), ())
+            if values:
+                parsed += 1
+            cast_started = perf_counter()
+            try:
+                value = field.get_value_from_found(values)
+            except Exception:
+                self.count(f'cast_failures.{section}.{field.attr}')
+                raise
+            cast_seconds += perf_counter() - cast_started
+            setattr(obj, field.attr, value)
+        self.count(f'fields.{section}', parsed)
+        self.add_time('cast', cast_seconds)
+        self.add_time('from_found', perf_counter() - started)
+        return obj
+
+    def to_dict(self) -> Dict[str, Dict]:
+        return {'seconds': dict(self.seconds), 'calls': dict(self.calls), 'counters': dict(self.counters)}
+
+    def __str__(self):
+        lines = [
+            f'{stage:22} {self.seconds[stage]:10.4f} с {self.calls[stage]:10} раз' for stage in sorted(self.seconds)
+        ]
+        lines.extend(f'{counter:40} {value:12}' for counter, value in sorted(self.counters.items()))
+        return '\n'.join(lines)
+
+
+class InstrumentState(threading.local):
+    """
+    Текущий сборщик статистики потока: разборы в других потоках (например, в пуле потоков asyncio) не попадают в
+    чужой сборщик, а вложенные instrument() разных потоков не восстанавливают сборщики друг друга
+    """
+    # None - инструментирование выключено, горячие пути проверяют его раз на секцию
+    stats: Optional[ParseStats] = None
+
+
+_state = InstrumentState()
+
+
+@contextmanager
+def instrument(stats: ParseStats = None, callback: Callable[[str, float], None] = None):
+    """
+    Включает сбор статистики разбора и сериализации в текущем потоке на время блока with
+
+        with instrument() as stats:
+            Statement.from_file(filename)
+        print(stats)
+
+    :param stats: сборщик, по умолчанию новый ParseStats(callback)
+    :param callback: см. ParseStats
+    :return: ParseStats
+    """
+    if stats is None:
+        stats = ParseStats(callback)
+    previous, _state.stats = _state.stats, stats
+    try:
+        yield stats
+    finally:
+        _state.stats = previous
+
+
+def get_stats() -> Optional[ParseStats]:
+    """
+    Сборщик статистики текущего потока или None, если инструментирование выключено
+    """
+    return _state.stats
+
+
+def call_instrumented(stats: Optional[ParseStats], function: Callable, *args):
+    """
+    Вызывает function(*args) со сборщиком stats, например в потоке пула: call_instrumented(get_stats(), ...)
+    """
+    if stats is None:
+        return function(*args)
+    with instrument(stats):
+        return function(*args)
+
+
+class StatementStructureError(ValueError):
+    """
+    Нарушена вложенность секций файла выписки: секция не закрыта, маркер конца без начала или нет *КонецФайла*
+    """
+
+    def __init__(self, message: str, line: int):
+        super(StatementStructureError, self).__init__(f'{message}, строка {line}')
+        self.message = message
+        self.line = line
+
+    def __reduce__(self):
+        # Для передачи из процессов пула: конструктор принимает сообщение и строку, а не args
+        return type(self), (self.message, self.line), self.__dict__
+
+
+class SectionSpan(NamedTuple):
+    """
+    Секция файла выписки: вид и границы текста. Текст секций остатков и документов начинается с маркера начала и
+    заканчивается перед маркером конца, у заголовка - от начала файла до первой секции
+    """
+    kind: str
+    start: int
+    end: int
+
+
+class SectionSplitter:
+    """
+    Конечный автомат разбиения файла 1CClientBankExchange на секции заголовка, остатков, документов и конца
+    файла. Автомат получает только строки, начинающиеся с маркеров секций, поэтому полный текст делится за
+    один линейный проход регулярным выражением, а потоковое чтение передает ему строки файла по одной
+    """
+
+    HEADER = 'header'
+    BALANCE = 'balance'
+    DOCUMENT = 'document'
+    END = 'end'
+
+    SECTION_BEGIN = 'Секция'
+    BALANCE_BEGIN = 'СекцияРасчСчет'
+    BALANCE_END = 'КонецРасчСчет'
+    DOCUMENT_BEGIN = 'СекцияДокумент'
+    DOCUMENT_END = 'КонецДокумента'
+    FILE_END = 'КонецФайла'
+
+    # Маркер начала -> вид секции, вид секции -> маркер конца
+    BEGINS = {BALANCE_BEGIN: BALANCE, DOCUMENT_BEGIN: DOCUMENT}
+    ENDS = {BALANCE: BALANCE_END, DOCUMENT: DOCUMENT_END}
+    # Порядок важен: длинные маркеры раньше общего префикса Секция
+    MARKERS = (BALANCE_BEGIN, DOCUMENT_BEGIN, BALANCE_END, DOCUMENT_END, FILE_END, SECTION_BEGIN)
+
+    def __init__(self, line_of: Callable[[int], int] = None):
+        """
+        :param line_of: номер строки по позиции, переданной в feed; по умолчанию позиция и есть номер строки
+        """
+        self.line_of = line_of or (lambda position: position)
+        self.state: Optional[str] = self.HEADER
+        self.start = 0
+        # Состояние построчного разбора push_lines: строки текущей секции и номер последней строки
+        self.block: List[str] = []
+        self.number = 0
+
+    def error(self, message: str, position: int):
+        return StatementStructureError(message, self.line_of(position))
+
+    def feed(self, marker: str, start: int, end: int) -> Iterator[SectionSpan]:
+        """
+        Переход по строке с маркером секции
+
+        :param marker: маркер из MARKERS в начале строки
+        :param start: позиция начала маркера
+        :param end: позиция конца маркера
+        :return: генератор закрытых этим маркером секций
+        """
+        state = self.state
+        if state == self.END:
+            return
+
+        if state is None or state == self.HEADER:
+            if marker in self.ENDS.values():
+                raise self.error(f'{marker} без начала секции', start)
+            if state == self.HEADER:
+                self.state = None
+                yield SectionSpan(self.HEADER, 0, start)
+            if marker in self.BEGINS:
+                self.state, self.start = self.BEGINS[marker], start
+            elif marker == self.FILE_END:
+                self.state, self.start = self.END, start
+                yield SectionSpan(self.END, start, end)
+        elif marker == self.ENDS.get(state):
+            self.state = None
+            yield SectionSpan(state, self.start, start)
+        elif marker != self.SECTION_BEGIN:
+            begin = self.DOCUMENT_BEGIN if state == self.DOCUMENT else self.BALANCE_BEGIN
+            raise self.error(
+                f'{begin} из строки {self.line_of(self.start)} не закрыта {self.ENDS[state]} до {marker}', start
+            )
+
+    def finish(self, end: int, require_end: bool = True) -> Iterator[SectionSpan]:
+        """
+        Завершение текста: незакрытая секция или отсутствие *КонецФайла* - ошибка
+
+        :param end: позиция конца текста
+        :param require_end: требовать *КонецФайла*
+        :return: генератор секций, закрытых концом текста (заголовок файла без секций)
+        """
+        state = self.state
+        if state == self.HEADER:
+            self.state = None
+            yield SectionSpan(self.HEADER, 0, end)
+        elif state in self.ENDS:
+            begin = self.DOCUMENT_BEGIN if state == self.DOCUMENT else self.BALANCE_BEGIN
+            raise self.error(f'{begin} из строки {self.line_of(self.start)} не закрыта {self.ENDS[state]}', end)
+
+        if require_end and self.state != self.END:
+            raise self.error(f'Нет {self.FILE_END}', end)
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_regex(cls, encoding: Optional[str] = None) -> Tuple[Pattern, Dict[AnyStr, str]]:
+        """
+        Регулярное выражение строк с маркерами секций для текста или, при заданной кодировке, для байтов
+
+        :param encoding: кодировка байтов или None для str
+        :return: пара (регулярное выражение, маркер в тексте -> маркер)
+        """
+        markers = {marker if encoding is None else marker.encode(encoding): marker for marker in cls.MARKERS}
+        alternatives = '|'.join(re.escape(marker) for marker in cls.MARKERS)
+        # Маркер только в начале строки: переводы строк \n и \r\n
+        pattern = f'^({alternatives})'
+        if encoding is not None:
+            pattern = pattern.encode(encoding)
+        return re.compile(pattern, re.M), markers
+
+    @classmethod
+    def iter_spans(cls, data, encoding: Optional[str] = None, require_end: bool = True) -> Iterator[SectionSpan]:
+        """
+        Делит полный текст файла на секции за один проход
+
+        :param data: текст (str) или байты файла (bytes, mmap) в кодировке encoding
+        :param encoding: кодировка байтов или None для str
+        :param require_end: требовать *КонецФайла*; для фрагментов файла False
+        :return: генератор SectionSpan в порядке следования
+        """
+        regex, markers = cls.get_regex(encoding)
+        newline = '\n' if encoding is None else b'\n'
+        splitter = cls(line_of=lambda position: data[:position].count(newline) + 1)
+
+        for match in regex.finditer(data):
+            yield from splitter.feed(markers[match.group(1)], match.start(), match.end())
+            if splitter.state == cls.END:
+                return
+        # Последняя строка файла, а не пустая строка после завершающего перевода строки
+        yield from splitter.finish(len(data) - 1 if data[-1:] == newline else len(data), require_end)
+
+    def push_lines(self, lines: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """
+        Построчный разбор: передает автомату очередные строки файла, секции копятся между вызовами. После
+        *КонецФайла* строки пропускаются
+
+        :param lines: строки файла с переводами строк
+        :return: генератор пар (вид секции, текст секции) для секций, закрытых этими строками; для END текст -
+            строка маркера
+        """
+        if self.state == self.END:
+            return
+
+        regex = self.get_regex()[0]
+        prefixes = (self.SECTION_BEGIN, self.BALANCE_END, self.DOCUMENT_END, self.FILE_END)
+        block = self.block
+        number = self.number
+
+        try:
+            for number, line in enumerate(lines, number + 1):
+                if line.startswith(prefixes):
+                    match = regex.match(line)
+                    for span in self.feed(match.group(1), number, number):
+                        yield span.kind, line if span.kind == self.END else ''.join(block)
+                        block = []
+                    if self.state == self.END:
+                        return
+                    if self.state in self.ENDS and self.start == number:
+                        block.append(line)
+                    continue
+
+                if self.state is not None:
+                    block.append(line)
+        finally:
+            self.block, self.number = block, number
+
+    def finish_lines(self, require_end: bool = True) -> Iterator[Tuple[str, str]]:
+        """
+        Завершение построчного разбора, см. finish
+
+        :param require_end: требовать *КонецФайла*
+        :return: генератор пар (вид секции, текст секции)
+        """
+        for span in self.finish(max(self.number, 1), require_end):
+            yield span.kind, ''.join(self.block)
+
+    @classmethod
+    def iter_line_sections(cls, lines: Iterable[str], require_end: bool = True) -> Iterator[Tuple[str, str]]:
+        """
+        Делит поток строк файла на тексты секций так же, как iter_spans делит полный текст
+
+        :param lines: итератор строк файла с переводами строк
+        :param require_end: требовать *КонецФайла*
+        :return: генератор пар (вид секции, текст секции), см. push_lines
+        """
+        splitter = cls()
+        yield from splitter.push_lines(lines)
+        yield from splitter.finish_lines(require_end)
+
+
 class Section:
+    __slots__ = ()
+
     class Meta(NamedTuple):
         regex: Pattern[str] = None
 
+    # Таблица полей и карта ключей заполняются в __init_subclass__ по Schema (и Subsections) класса секции
+    fields: Tuple[CompiledField, ...] = ()
+    key_map: Mapping[str, Tuple[Tuple[Optional[str], str], ...]] = MappingProxyType({})
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+
+        schema = getattr(cls, 'Schema', None)
+        if schema is None:
+            return
+
+        cls.fields = tuple(CompiledField.from_field(attr, field) for attr, field in schema.to_dict().items())
+
+        key_map = {}
+        sections = [(None, cls)]
+        if hasattr(cls, 'Subsections'):
+            sections.extend(cls.Subsections.to_dict().items())
+        for name, section in sections:
+            for field in section.fields:
+                key_map[field.key] = key_map.get(field.key, ()) + ((name, field.attr),)
+        cls.key_map = MappingProxyType(key_map)
+
     @classmethod
     def extract_section_text(cls, source_text: AnyStr):
         regex = cls.Meta.regex
@@ -187,52 +701,66 @@ class Section:
                 return result
 
     @classmethod
-    def from_text(cls, section_text):
-        obj = cls()
-        for key, field in cls.Schema.to_dict().items():
-            value = field.get_value_from_text(section_text)
-            setattr(obj, key, value)
-        return obj
+    def split_lines(cls, section_text: AnyStr, key_map: Mapping[str, Tuple[Tuple[Optional[str], str], ...]] = None
+                    ) -> Dict[Tuple[Optional[str], str], List[str]]:
+        """
+        Разбивает текст секции на строки *КЛЮЧ=значение* за один проход
 
-    def to_text(self, validate=True):
+        :param section_text: текст секции
+        :param key_map: карта ключей, по умолчанию key_map класса; строки с другими ключами пропускаются
+        :return: словарь (подсекция или None, аттрибут) -> список значений в порядке следования строк
+        """
+        if key_map is None:
+            key_map = cls.key_map
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
+        found = {}
+        for line in section_text.split('\n'):
+            key, sep, value = line.partition('=')
+            if sep and key in key_map:
+                for target in key_map[key]:
+                    found.setdefault(target, []).append(value)
+        if stats is not None:
+            stats.add_time('split_lines', perf_counter() - started)
+        return found
 
-        # noinspection PyShadowingNames
-        def get_text(key, field, attr):
-            # noinspection PyShadowingNames
-            def get_line(key, field, attr):
-                is_flag = field.type == Type.FLAG
-                name = field.key
-                value = field.type.value.cast_to_text(attr)
-                required = Required.TO_BANK in field.required
-                if not required and not value:
-                    return ''
-                else:
-                    return f'{name}' if is_flag else f'{name}={value}'
+    @classmethod
+    def from_found(cls, found: Dict[Tuple[Optional[str], str], List[str]], name: Optional[str] = None,
+                   fields: Tuple[CompiledField, ...] = None):
+        """
+        Конструктор секции из результата split_lines
 
-            if attr and field.type == Type.ARRAY:
-                lines = [get_line(key, field, item) for item in attr]
-                return '\n'.join(lines) if lines else ''
-            else:
-                return get_line(key, field, attr)
+        :param found: результат split_lines
+        :param name: имя подсекции в found или None для самой секции
+        :param fields: заполняемые поля, по умолчанию все поля класса; остальные аттрибуты равны None
+        :return: Заполненный объект секции
+        """
+        obj = cls()
+        stats = _state.stats
+        if stats is not None:
+            return stats.fill_section(obj, found, name, cls.fields if fields is None else fields)
+        for field in cls.fields if fields is None else fields:
+            setattr(obj, field.attr, field.get_value_from_found(found.get((name, field.attr), ())))
+        return obj
 
-        # noinspection PyShadowingNames
-        def validate_attr(key, field, attr):
-            is_flag = field.type == Type.FLAG
-            name = field.key
-            value = field.type.value.cast_to_text(attr)
-            required = Required.TO_BANK in field.required
-            if required and not is_flag and not value:
-                raise ValueError(f'Обязательны при отправке в банк аттрибут {name} не содержит значения!')
+    @classmethod
+    def from_text(cls, section_text):
+        return cls.from_found(cls.split_lines(section_text))
 
+    def to_text(self, validate=True):
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
         result = []
-        for key, field in self.__class__.Schema.to_dict().items():
-            attr = getattr(self, key, None)
-            if validate:
-                validate_attr(key, field, attr)
-            text = get_text(key, field, attr)
-            result.append(text)
+        for field in self.fields:
+            text = field.render(getattr(self, field.attr, None), validate)
+            if text:
+                result.append(text)
 
-        return '\n'.join(filter(lambda x: x != '', result))
+        if stats is not None:
+            stats.add_time('to_text', perf_counter() - started)
+        return '\n'.join(result)
 
     def __str__(self):
         return self.to_text(validate=False)
@@ -257,9 +785,15 @@ class Header(Section):
         creation_time = Field('ВремяСоздания', 'Время формирования файла', type=Type.TIME)
         filter_date_since = Field('ДатаНачала', 'Дата начала интервала', Required.BOTH, type=Type.DATE)
         filter_date_till = Field('ДатаКонца', 'Дата конца интервала', Required.BOTH, type=Type.DATE)
-        filter_account_numbers = Field('РасчСчет', 'Расчетный счет организации', Required.BOTH, type=Type.ARRAY)
+        filter_account_numbers = Field('РасчСчет', 'Расчетный счет организации', Required.BOTH, type=Type.ARRAY,
+                                       intern=True)
         filter_document_types = Field('Документ', 'Вид документа', type=Type.ARRAY)
 
+    __slots__ = (
+        'format_name', 'format_version', 'encoding', 'sender', 'receiver', 'creation_date', 'creation_time',
+        'filter_date_since', 'filter_date_till', 'filter_account_numbers', 'filter_document_types'
+    )
+
     def __init__(self, format_name: str = None, format_version: str = None, encoding: str = None, sender: str = None,
                  receiver: str = None, creation_date: Type.DATE.value.type = None,
                  creation_time: Type.TIME.value.type = None, filter_date_since: Type.DATE.value.type = None,
@@ -280,8 +814,8 @@ class Header(Section):
 
     @classmethod
     def from_text(cls, source_text):
-        section_text = cls.extract_section_text(source_text)
-        return super().from_text(section_text)
+        span = next(SectionSplitter.iter_spans(source_text, require_end=False))
+        return super().from_text(source_text[span.start:span.end])
 
 
 class Balance(Section):
@@ -296,13 +830,18 @@ class Balance(Section):
         tag_begin = Field('СекцияРасчСчет', 'Признак начала секции', type=Type.FLAG)
         date_since = Field('ДатаНачала', 'Дата начала интервала', Required.FROM_BANK, type=Type.DATE)
         date_till = Field('ДатаКонца', 'Дата конца интервала', type=Type.DATE)
-        account_number = Field('РасчСчет', 'Расчетный счет организации', Required.FROM_BANK)
+        account_number = Field('РасчСчет', 'Расчетный счет организации', Required.FROM_BANK, intern=True)
         initial_balance = Field('НачальныйОстаток', 'Начальный остаток', Required.FROM_BANK, type=Type.AMOUNT)
         total_income = Field('ВсегоПоступило', 'Обороты входящих платежей', type=Type.AMOUNT)
         total_expense = Field('ВсегоСписано', 'Обороты исходящих платежей', type=Type.AMOUNT)
         final_balance = Field('КонечныйОстаток', 'Конечный остаток', type=Type.AMOUNT)
         tag_end = Field('КонецРасчСчет', 'Признак окончания секции', type=Type.FLAG)
 
+    __slots__ = (
+        'tag_begin', 'date_since', 'date_till', 'account_number', 'initial_balance', 'total_income', 'total_expense',
+        'final_balance', 'tag_end'
+    )
+
     def __init__(self, tag_begin: str = None, date_since: Type.DATE.value.type = None,
                  date_till: Type.DATE.value.type = None, account_number: str = None,
                  initial_balance: Type.AMOUNT.value.type = None, total_income: Type.AMOUNT.value.type = None,
@@ -325,8 +864,11 @@ class Balance(Section):
 
     @classmethod
     def from_text(cls, source_text):
-        section_text = cls.extract_section_text(source_text)
-        return super().from_text(section_text)
+        # Выписка по нескольким счетам: здесь разбирается первая секция остатков, все - в Statement.from_text
+        for span in SectionSplitter.iter_spans(source_text, require_end=False):
+            if span.kind == SectionSplitter.BALANCE:
+                return super().from_text(source_text[span.start:span.end])
+        return None
 
 
 class Receipt(Section):
@@ -339,6 +881,8 @@ class Receipt(Section):
         time = Field('КвитанцияВремя', 'Время формирования квитанции', type=Type.TIME)
         content = Field('КвитанцияСодержание', 'Содержание квитанции')
 
+    __slots__ = ('date', 'time', 'content')
+
     # noinspection PyShadowingNames
     def __init__(self, date: Type.DATE.value.type = None, time: Type.TIME.value.type = None, content: str = None):
         super(Receipt, self).__init__()
@@ -356,19 +900,24 @@ class Payer(Section):
         regex = None
 
     class Schema(Schema):
-        account = Field('ПлательщикСчет', 'Расчетный счет плательщика', Required.BOTH)
+        account = Field('ПлательщикСчет', 'Расчетный счет плательщика', Required.BOTH, intern=True)
         date_charged = Field('ДатаСписано', 'Дата списания средств с р/с', Required.FROM_BANK, type=Type.DATE)
         name = Field('Плательщик', 'Плательщик', Required.TO_BANK)
-        inn = Field('ПлательщикИНН', 'ИНН плательщика', Required.BOTH)
+        inn = Field('ПлательщикИНН', 'ИНН плательщика', Required.BOTH, intern=True)
         l1_name = Field('Плательщик1', 'Наименование плательщика, стр. 1', Required.TO_BANK)
         l2_account_number = Field('Плательщик2', 'Наименование плательщика, стр. 2')
-        l3_bank = Field('Плательщик3', 'Наименование плательщика, стр. 3')
-        l4_city = Field('Плательщик4', 'Наименование плательщика, стр. 4')
-        account_number = Field('ПлательщикРасчСчет', 'Расчетный счет плательщика', Required.TO_BANK)
-        bank_1_name = Field('ПлательщикБанк1', 'Банк плательщика', Required.TO_BANK)
-        bank_2_city = Field('ПлательщикБанк2', 'Город банка плательщика', Required.TO_BANK)
-        bank_bic = Field('ПлательщикБИК', 'БИК банка плательщика', Required.TO_BANK)
-        bank_corr_account = Field('ПлательщикКорсчет', 'Корсчет банка плательщика', Required.TO_BANK)
+        l3_bank = Field('Плательщик3', 'Наименование плательщика, стр. 3', intern=True)
+        l4_city = Field('Плательщик4', 'Наименование плательщика, стр. 4', intern=True)
+        account_number = Field('ПлательщикРасчСчет', 'Расчетный счет плательщика', Required.TO_BANK, intern=True)
+        bank_1_name = Field('ПлательщикБанк1', 'Банк плательщика', Required.TO_BANK, intern=True)
+        bank_2_city = Field('ПлательщикБанк2', 'Город банка плательщика', Required.TO_BANK, intern=True)
+        bank_bic = Field('ПлательщикБИК', 'БИК банка плательщика', Required.TO_BANK, intern=True)
+        bank_corr_account = Field('ПлательщикКорсчет', 'Корсчет банка плательщика', Required.TO_BANK, intern=True)
+
+    __slots__ = (
+        'account', 'date_charged', 'name', 'inn', 'l1_name', 'l2_account_number', 'l3_bank', 'l4_city',
+        'account_number', 'bank_1_name', 'bank_2_city', 'bank_bic', 'bank_corr_account'
+    )
 
     def __init__(self, account: str = None, date_charged: Type.DATE.value.type = None, name: str = None,
                  inn: str = None, l1_name: str = None, l2_account_number: str = None, l3_bank: str = None,
@@ -399,19 +948,24 @@ class Receiver(Section):
         regex = None
 
     class Schema(Schema):
-        account = Field('ПолучательСчет', 'Расчетный счет получателя', Required.BOTH)
+        account = Field('ПолучательСчет', 'Расчетный счет получателя', Required.BOTH, intern=True)
         date_received = Field('ДатаПоступило', 'Дата поступления средств на р/с', Required.FROM_BANK)
         name = Field('Получатель', 'Получатель', Required.TO_BANK)
-        inn = Field('ПолучательИНН', 'ИНН получателя', Required.BOTH)
+        inn = Field('ПолучательИНН', 'ИНН получателя', Required.BOTH, intern=True)
         l1_name = Field('Получатель1', 'Наименование получателя', Required.TO_BANK)
         l2_account_number = Field('Получатель2', 'Наименование получателя, стр. 2')
-        l3_bank = Field('Получатель3', 'Наименование получателя, стр. 3')
-        l4_city = Field('Получатель4', 'Наименование получателя, стр. 4')
-        account_number = Field('ПолучательРасчСчет', 'Расчетный счет получателя', Required.TO_BANK)
-        bank_1_name = Field('ПолучательБанк1', 'Банк получателя', Required.TO_BANK)
-        bank_2_city = Field('ПолучательБанк2', 'Город банка получателя', Required.TO_BANK)
-        bank_bic = Field('ПолучательБИК', 'БИК банка получателя', Required.TO_BANK)
-        bank_corr_account = Field('ПолучательКорсчет', 'Корсчет банка получателя', Required.TO_BANK)
+        l3_bank = Field('Получатель3', 'Наименование получателя, стр. 3', intern=True)
+        l4_city = Field('Получатель4', 'Наименование получателя, стр. 4', intern=True)
+        account_number = Field('ПолучательРасчСчет', 'Расчетный счет получателя', Required.TO_BANK, intern=True)
+        bank_1_name = Field('ПолучательБанк1', 'Банк получателя', Required.TO_BANK, intern=True)
+        bank_2_city = Field('ПолучательБанк2', 'Город банка получателя', Required.TO_BANK, intern=True)
+        bank_bic = Field('ПолучательБИК', 'БИК банка получателя', Required.TO_BANK, intern=True)
+        bank_corr_account = Field('ПолучательКорсчет', 'Корсчет банка получателя', Required.TO_BANK, intern=True)
+
+    __slots__ = (
+        'account', 'date_received', 'name', 'inn', 'l1_name', 'l2_account_number', 'l3_bank', 'l4_city',
+        'account_number', 'bank_1_name', 'bank_2_city', 'bank_bic', 'bank_corr_account'
+    )
 
     def __init__(self, account: str = None, date_received: str = None, name: str = None, inn: str = None,
                  l1_name: str = None, l2_account_number: str = None, l3_bank: str = None, l4_city: str = None,
@@ -453,6 +1007,11 @@ class Payment(Section):
         purpose_l5 = Field('НазначениеПлатежа5', 'Назначение платежа, стр. 5')
         purpose_l6 = Field('НазначениеПлатежа6', 'Назначение платежа, стр. 6')
 
+    __slots__ = (
+        'payment_type', 'operation_type', 'code', 'purpose', 'purpose_l1', 'purpose_l2', 'purpose_l3', 'purpose_l4',
+        'purpose_l5', 'purpose_l6'
+    )
+
     def __init__(self, payment_type: str = None, operation_type: str = None, code: str = None, purpose: str = None,
                  purpose_l1: str = None, purpose_l2: str = None, purpose_l3: str = None, purpose_l4: str = None,
                  purpose_l5: str = None, purpose_l6: str = None):
@@ -480,8 +1039,8 @@ class Tax(Section):
 
     class Schema(Schema):
         originator_status = Field('СтатусСоставителя', 'Статус составителя расчетного документа', Required.BOTH)
-        payer_kpp = Field('ПлательщикКПП', 'КПП плательщика', Required.BOTH)
-        receiver_kpp = Field('ПолучательКПП', 'КПП получателя', Required.BOTH)
+        payer_kpp = Field('ПлательщикКПП', 'КПП плательщика', Required.BOTH, intern=True)
+        receiver_kpp = Field('ПолучательКПП', 'КПП получателя', Required.BOTH, intern=True)
         kbk = Field('ПоказательКБК', 'Показатель кода бюджетной классификации', Required.BOTH)
         okato = Field('ОКАТО',
                       'Код ОКТМО территории, на которой мобилизуются денежные средства от уплаты налога, сбора и иного '
@@ -492,6 +1051,10 @@ class Tax(Section):
         date = Field('ПоказательДаты', 'Показатель даты документа', Required.BOTH)
         type = Field('ПоказательТипа', 'Показатель типа платежа')
 
+    __slots__ = (
+        'originator_status', 'payer_kpp', 'receiver_kpp', 'kbk', 'okato', 'basis', 'period', 'number', 'date', 'type'
+    )
+
     # noinspection PyShadowingNames
     def __init__(self, originator_status: str = None, payer_kpp: str = None, receiver_kpp: str = None, kbk: str = None,
                  okato: str = None, basis: str = None, period: str = None, number: str = None, date: str = None,
@@ -530,6 +1093,12 @@ class Special(Section):
         supplier_account_number = Field('НомерСчетаПоставщика', '№ счета поставщика')
         docs_sent_date = Field('ДатаОтсылкиДок', 'Дата отсылки документов')
 
+    __slots__ = (
+        'priority', 'term_of_acceptance', 'letter_of_credit_type', 'maturity', 'payment_condition_1',
+        'payment_condition_2', 'payment_condition_3', 'by_submission', 'extra_conditions', 'supplier_account_number',
+        'docs_sent_date'
+    )
+
     def __init__(self, priority: str = None, term_of_acceptance: str = None, letter_of_credit_type: str = None,
                  maturity: str = None, payment_condition_1: str = None, payment_condition_2: str = None,
                  payment_condition_3: str = None, by_submission: str = None, extra_conditions: str = None,
@@ -548,6 +1117,15 @@ class Special(Section):
         self.docs_sent_date = docs_sent_date
 
 
+class Projection(NamedTuple):
+    """
+    Набор разбираемых полей документа, см. Document.get_projection
+    """
+    key_map: Mapping[str, Tuple[Tuple[Optional[str], str], ...]]
+    fields: Mapping[Optional[str], Tuple[CompiledField, ...]]
+    subsections: Tuple[Tuple[str, type], ...]
+
+
 class Document(Section):
     """
     Секция платежного документа, содержит шапку платежного документа и подсекции: квитанция, реквизиты
@@ -559,7 +1137,7 @@ class Document(Section):
         regex = re.compile(r'(СекцияДокумент.*?)КонецДокумента', re.S)
 
     class Schema(Schema):
-        document_type = Field('СекцияДокумент', 'Признак начала секции')  # содержит вид документа
+        document_type = Field('СекцияДокумент', 'Признак начала секции', intern=True)  # содержит вид документа
         number = Field('Номер', 'Номер документа', Required.BOTH)
         date = Field('Дата', 'Дата документа', Required.BOTH, type=Type.DATE)
         amount = Field('Сумма', 'Сумма платежа', Required.BOTH, type=Type.AMOUNT)
@@ -572,6 +1150,13 @@ class Document(Section):
         tax = Tax
         special = Special
 
+    __slots__ = (
+        'document_type', 'number', 'date', 'amount', 'receipt', 'payer', 'receiver', 'payment', 'tax', 'special'
+    )
+
+    # Поля, которые однозначно определяют документ при повторной выгрузке банком, см. get_natural_key
+    NATURAL_KEY = ('number', 'date', 'amount', 'payer.account', 'receiver.account', 'payment.code')
+
     # noinspection PyShadowingNames
     def __init__(self, document_type: str = None, number: str = None, date: Type.DATE.value.type = None,
                  amount: str = None, receipt: Receipt = None, payer: Payer = None, receiver: Receiver = None,
@@ -589,25 +1174,149 @@ class Document(Section):
         self.special = special
 
     @classmethod
-    def from_text(cls, source_text: AnyStr):
-        extracted = cls.extract_section_text(source_text)
+    def from_text(cls, source_text: AnyStr, workers: Optional[int] = None, batch_size: int = 1000,
+                  fields: Optional[Iterable[str]] = None):
+        """
+        Конструктор списка платежных документов из текста файла
 
-        if not isinstance(extracted, list):
-            extracted = [extracted]
+        :param source_text: Полный текст файла выписки в формате 1CClientBankExchange
+        :param workers: Количество процессов для разбора документов, по умолчанию разбор в текущем процессе
+        :param batch_size: Количество документов, передаваемых процессу за раз
+        :param fields: Разбираемые поля, см. get_projection; по умолчанию все
+        :return: Список документов в порядке следования в файле
+        """
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
+        extracted = [
+            source_text[span.start:span.end]
+            for span in SectionSplitter.iter_spans(source_text, require_end=False)
+            if span.kind == SectionSplitter.DOCUMENT
+        ]
+        if stats is not None:
+            stats.add_time('split', perf_counter() - started)
+            stats.count('sections.document', len(extracted))
 
-        results = []
-        for section_text in extracted:
-            obj: cls = super().from_text(section_text)
-            obj.receipt = Receipt.from_text(section_text)
-            obj.payer = Payer.from_text(section_text)
-            obj.receiver = Receiver.from_text(section_text)
-            obj.payment = Payment.from_text(section_text)
-            obj.tax = Tax.from_text(section_text)
-            obj.special = Special.from_text(section_text)
-            results.append(obj)
+        documents = cls.from_section_texts_parallel(extracted, workers=workers, batch_size=batch_size, fields=fields)
+        if stats is not None:
+            stats.add_time('document.from_text', perf_counter() - started)
+        return documents
+
+    @classmethod
+    def from_section_texts_parallel(cls, extracted: List[AnyStr], workers: Optional[int] = None,
+                                    batch_size: int = 1000, fields: Optional[Iterable[str]] = None):
+        """
+        Конструктор списка платежных документов из текстов секций, при workers > 1 - в пуле процессов
+
+        :param extracted: тексты секций от *СекцияДокумент* до *КонецДокумента*
+        :param workers: Количество процессов для разбора документов, по умолчанию разбор в текущем процессе
+        :param batch_size: Количество документов, передаваемых процессу за раз
+        :param fields: Разбираемые поля, см. get_projection; по умолчанию все
+        :return: Список документов в порядке следования
+        """
+        if fields is not None:
+            fields = frozenset(fields)
 
+        if not workers or workers < 2 or len(extracted) <= batch_size:
+            return cls.from_section_texts(extracted, fields=fields)
+
+        batches = [extracted[start:start + batch_size] for start in range(0, len(extracted), batch_size)]
+        starts = range(0, len(extracted), batch_size)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return [
+                document
+                for documents in executor.map(cls.from_section_texts, batches, starts, repeat(fields))
+                for document in documents
+            ]
+
+    @classmethod
+    def from_section_texts(cls, section_texts: List[AnyStr], start: int = 0, fields: Optional[Iterable[str]] = None):
+        """
+        Конструктор списка платежных документов из текстов секций
+
+        Исключение разбора пробрасывается как есть, с номером документа (от нуля) в аттрибуте *document_index*
+
+        :param section_texts: тексты секций от *СекцияДокумент* до *КонецДокумента*
+        :param start: номер первого документа в файле
+        :param fields: Разбираемые поля, см. get_projection; по умолчанию все
+        :return: Список документов
+        """
+        if fields is not None:
+            fields = frozenset(fields)
+
+        results = []
+        for index, section_text in enumerate(section_texts, start):
+            try:
+                results.append(cls.from_section_text(section_text, fields))
+            except Exception as e:
+                e.document_index = index
+                raise
         return results
 
+    @classmethod
+    def from_section_text(cls, section_text: AnyStr, fields: Optional[FrozenSet[str]] = None):
+        """
+        Конструктор платежного документа из текста одной секции
+
+        :param section_text: текст от *СекцияДокумент* до *КонецДокумента*
+        :param fields: Разбираемые поля, см. get_projection; по умолчанию все
+        :return: Заполненный объект платежного документа
+        """
+        projection = cls.get_projection(fields)
+        found = cls.split_lines(section_text, projection.key_map)
+        obj: cls = cls.from_found(found, fields=projection.fields[None])
+        for name, section in projection.subsections:
+            setattr(obj, name, section.from_found(found, name, projection.fields[name]))
+        return obj
+
+    @classmethod
+    @lru_cache(maxsize=None)
+    def get_projection(cls, fields: Optional[FrozenSet[str]] = None) -> 'Projection':
+        """
+        Проекция документа на набор полей: поля документа указываются именем аттрибута (*number*), поля подсекций -
+        через точку (*payer.inn*), подсекция целиком - своим именем (*payer*). Подсекции без выбранных полей не
+        создаются и остаются None, остальные аттрибуты выбранных подсекций равны None.
+
+        :param fields: имена полей или None для всех полей
+        :return: Projection
+        """
+        subsections = cls.Subsections.to_dict()
+        if fields is None:
+            selected = {None: cls.fields}
+            selected.update({name: section.fields for name, section in subsections.items()})
+        else:
+            chosen = {None: set()}
+            for path in fields:
+                name, _, attr = path.rpartition('.')
+                name = name or None
+                if name is None and attr in subsections:
+                    name, attr = attr, None
+                if name is not None and name not in subsections:
+                    raise ValueError(f'Неизвестная подсекция {name} в поле {path}')
+
+                attrs = {field.attr for field in (cls if name is None else subsections[name]).fields}
+                if attr is not None and attr not in attrs:
+                    raise ValueError(f'Неизвестное поле {path}')
+                chosen.setdefault(name, set()).update(attrs if attr is None else {attr})
+
+            selected = {
+                name: tuple(
+                    field for field in (cls if name is None else subsections[name]).fields if field.attr in attrs
+                )
+                for name, attrs in chosen.items()
+            }
+
+        key_map = {}
+        for name, section_fields in selected.items():
+            for field in section_fields:
+                key_map[field.key] = key_map.get(field.key, ()) + ((name, field.attr),)
+
+        return Projection(
+            key_map=MappingProxyType(key_map),
+            fields=MappingProxyType(selected),
+            subsections=tuple((name, section) for name, section in subsections.items() if name in selected),
+        )
+
     def to_text(self, validate=True):
         content = super(Document, self).to_text(validate=validate)
         sections = list(filter(None, [self.receipt, self.payer, self.receiver, self.payment, self.tax, self.special]))
@@ -615,40 +1324,374 @@ class Document(Section):
         sections.append('КонецДокумента')
         return content + '\n' + '\n'.join(sections)
 
+    def get_natural_key(self) -> str:
+        """
+        Стабильный ключ документа по полям NATURAL_KEY: одинаков для документа из пересекающихся выписок. Разные
+        документы с совпадающими полями NATURAL_KEY получают один ключ и при идемпотентном импорте считаются одним
+        документом (сохраняется последний)
+
+        :return: sha1 в шестнадцатеричном виде
+        """
+        values = []
+        for path in self.NATURAL_KEY:
+            name, _, attr = path.rpartition('.')
+            section = getattr(self, name) if name else self
+            value = getattr(section, attr) if section is not None else None
+            if isinstance(value, Decimal):
+                value = value.normalize()
+            values.append('' if value is None else str(value))
+        return hashlib.sha1('\x1f'.join(values).encode()).hexdigest()
+
+
+class LazyDocument(Document):
+    """
+    Платежный документ, который хранит текст своей секции и разбирает поле или подсекцию только при первом
+    обращении к ним. Ошибки разбора поля (например, повторяющийся ключ) возникают при обращении к этому полю.
+    С проекцией (fields) поля и подсекции вне нее равны None, как у Document
+    """
+
+    __slots__ = ('_section_text', '_found', '_projection')
+
+    @classmethod
+    def from_section_text(cls, section_text: AnyStr, fields: Optional[FrozenSet[str]] = None):
+        obj = cls.__new__(cls)
+        obj._section_text = section_text
+        obj._projection = cls.get_projection(fields) if fields is not None else None
+        return obj
+
+    def get_fields(self, name: Optional[str] = None) -> Optional[Tuple[CompiledField, ...]]:
+        """
+        Поля документа (name=None) или подсекции в проекции: None - все поля, пустой кортеж - подсекции нет в проекции
+        """
+        projection = getattr(self, '_projection', None)
+        if projection is None:
+            return None
+        return projection.fields.get(name, ())
+
+    def find(self, field: CompiledField) -> List[str]:
+        """
+        Значения поля документа: пока подсекции не разобраны, поле ищется своим регулярным выражением без разбора
+        всего текста секции
+        """
+        try:
+            return self._found.get((None, field.attr), ())
+        except AttributeError:
+            return field.regex.findall(self._section_text)
+
+    def get_found(self) -> Dict[Tuple[Optional[str], str], List[str]]:
+        """
+        Результат split_lines для текста секции, вычисляется один раз
+        """
+        try:
+            return self._found
+        except AttributeError:
+            projection = getattr(self, '_projection', None)
+            self._found = self.split_lines(self._section_text, projection.key_map if projection else None)
+            del self._section_text
+            return self._found
+
+    def __reduce__(self):
+        # Состояние слотов по умолчанию читает все свойства и тем самым разбирает документ целиком: вместо этого
+        # передается неразобранный текст (или результат split_lines) и уже заполненные слоты
+        projection = getattr(self, '_projection', None)
+        fields = get_projection_paths(projection) if projection is not None else None
+        values = {}
+        for slot in Document.__slots__:
+            try:
+                values[slot] = Document.__dict__[slot].__get__(self)
+            except AttributeError:
+                pass
+        source = getattr(self, '_section_text', None)
+        found = getattr(self, '_found', None) if source is None else None
+        encoding = None
+        if isinstance(source, str):
+            # Текст выписки в cp1251 занимает байт на символ, а не два, как кириллица в UTF-8 внутри pickle
+            try:
+                source, encoding = source.encode('cp1251'), 'cp1251'
+            except UnicodeEncodeError:
+                pass
+        return restore_lazy_document, (type(self), source, encoding, found, fields, values)
+
+
+def get_projection_paths(projection: Projection) -> FrozenSet[str]:
+    """
+    Имена полей, по которым Document.get_projection строит ту же проекцию
+    """
+    return frozenset(
+        field.attr if name is None else f'{name}.{field.attr}'
+        for name, section_fields in projection.fields.items() for field in section_fields
+    )
+
+
+def restore_lazy_document(cls: type, source: Optional[AnyStr], encoding: Optional[str],
+                          found: Optional[Dict[Tuple[Optional[str], str], List[str]]], fields: Optional[FrozenSet[str]],
+                          values: Dict[str, Any]) -> LazyDocument:
+    """
+    Восстанавливает LazyDocument при распаковке pickle, см. LazyDocument.__reduce__
+    """
+    obj = cls.from_section_text(source.decode(encoding) if encoding else source, fields)
+    if source is None:
+        del obj._section_text
+        obj._found = found
+    for slot, value in values.items():
+        Document.__dict__[slot].__set__(obj, value)
+    return obj
+
+
+def lazy_attribute(slot, load: Callable[[LazyDocument], Any]) -> property:
+    """
+    Свойство, которое при первом чтении заполняет слот результатом load
+
+    :param slot: дескриптор слота Document
+    :param load: функция разбора значения из LazyDocument.get_found()
+    :return: property
+    """
+
+    def getter(self):
+        try:
+            return slot.__get__(self)
+        except AttributeError:
+            value = load(self)
+            slot.__set__(self, value)
+            return value
+
+    return property(getter, slot.__set__, slot.__delete__)
+
+
+def load_lazy_field(self: LazyDocument, field: CompiledField) -> Any:
+    fields = self.get_fields()
+    if fields is not None and field not in fields:
+        return None
+    return field.get_value_from_found(self.find(field))
+
+
+def load_lazy_subsection(self: LazyDocument, name: str, section: type) -> Optional[Section]:
+    fields = self.get_fields(name)
+    if fields is not None and not fields:
+        return None
+    return section.from_found(self.get_found(), name, fields)
+
+
+for _field in Document.fields:
+    setattr(LazyDocument, _field.attr, lazy_attribute(
+        Document.__dict__[_field.attr],
+        lambda self, field=_field: load_lazy_field(self, field)
+    ))
+
+for _name, _section in Document.Subsections.to_dict().items():
+    setattr(LazyDocument, _name, lazy_attribute(
+        Document.__dict__[_name],
+        lambda self, name=_name, section=_section: load_lazy_subsection(self, name, section)
+    ))
+
+del _field, _name, _section
+
+
+# Ключ группы документов для загрузки в банк: БИК банка плательщика и счет плательщика или None
+BankKey = Tuple[str, Optional[str]]
+
+
+class BankGroup:
+    """
+    Документы одного банка плательщика (и одного счета, если группировка по счетам) с накопленными при добавлении
+    периодом и счетами для заголовка файла загрузки в банк
+    """
+    __slots__ = ('bic', 'accounts', 'date_since', 'date_till', 'documents')
+
+    def __init__(self, bic: Optional[str]):
+        self.bic = bic
+        self.accounts = set()
+        self.date_since: Optional[date] = None
+        self.date_till: Optional[date] = None
+        self.documents: List[Document] = []
+
+    def add(self, document: Document):
+        self.documents.append(document)
+        self.accounts.add(document.payer.account_number)
+        if document.date is not None:
+            if self.date_since is None or document.date < self.date_since:
+                self.date_since = document.date
+            if self.date_till is None or document.date > self.date_till:
+                self.date_till = document.date
+
+    def get_header(self, sender: str) -> Header:
+        return Header(
+            format_version='1.02',
+            encoding='Windows',
+            sender=sender,
+            creation_date=date.today(),
+            creation_time=datetime.now(),
+            filter_date_since=self.date_since,
+            filter_date_till=self.date_till,
+            filter_account_numbers=self.accounts
+        )
+
 
 class Statement:
-    def __init__(self, header: Header, balance: Balance = None, documents: List[Document] = None):
+    def __init__(self, header: Header, balance: Balance = None, documents: List[Document] = None,
+                 balances: List[Balance] = None):
         super(Statement, self).__init__()
         self.header: Header = header
-        self.balance: Balance = balance
+        self.balances: List[Balance] = list(balances) if balances is not None else [balance] if balance else []
         self.documents: List[Document] = documents
 
+    @property
+    def balance(self) -> Optional[Balance]:
+        """
+        Остатки по первому счету выписки, для выписок по нескольким счетам см. balances
+        """
+        return self.balances[0] if self.balances else None
+
+    @balance.setter
+    def balance(self, value: Optional[Balance]):
+        self.balances = ([value] if value is not None else []) + self.balances[1:]
+
+    def get_balances_by_account(self) -> Dict[str, Balance]:
+        """
+        Остатки, сгруппированные по номеру расчетного счета
+
+        :return: словарь счет -> Balance
+        """
+        return {balance.account_number: balance for balance in self.balances}
+
+    def get_documents_by_account(self) -> Dict[str, List[Document]]:
+        """
+        Документы по каждому счету секций остатков: списания, где счет плательщика совпадает со счетом остатков, и
+        поступления, где с ним совпадает счет получателя
+
+        :return: словарь счет -> список документов в порядке выписки
+        """
+        result = {balance.account_number: [] for balance in self.balances}
+        for document in self.documents or ():
+            accounts = set()
+            for section in (document.payer, document.receiver):
+                if section is not None:
+                    accounts.add(section.account or section.account_number)
+            for account in accounts:
+                if account in result:
+                    result[account].append(document)
+        return result
+
     @classmethod
-    def from_file(cls, filename: str):
+    def split_sections(cls, source_text: AnyStr) -> Tuple[str, List[str], List[str]]:
+        """
+        Тексты секций выписки за один проход SectionSplitter
+
+        :param source_text: Полный текст файла выписки в формате 1CClientBankExchange
+        :return: тройка (текст заголовка, тексты секций остатков, тексты секций документов)
+        :raises StatementStructureError: секция не закрыта или нет *КонецФайла*
+        """
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
+        header, balances, documents = '', [], []
+        for kind, start, end in SectionSplitter.iter_spans(source_text):
+            if kind == SectionSplitter.DOCUMENT:
+                documents.append(source_text[start:end])
+            elif kind == SectionSplitter.BALANCE:
+                balances.append(source_text[start:end])
+            elif kind == SectionSplitter.HEADER:
+                header = source_text[start:end]
+        if stats is not None:
+            stats.add_time('split', perf_counter() - started)
+            stats.count('sections.header')
+            stats.count('sections.balance', len(balances))
+            stats.count('sections.document', len(documents))
+        return header, balances, documents
+
+    @classmethod
+    def from_file(cls, filename: str, workers: Optional[int] = None, lazy: bool = False,
+                  fields: Optional[Iterable[str]] = None):
         """
         Конструктор полного документа выписки из файла
 
         :param filename: Путь к файлу
+        :param workers: Количество процессов для разбора документов, см. Document.from_text
+        :param lazy: Создавать LazyDocument, которые разбирают поля при обращении
+        :param fields: Разбираемые поля документов, см. Document.get_projection
         :return: Заполненный объект полного документа выписки
         """
         text = open(filename, encoding='cp1251').read()
-        return cls.from_text(text)
+        stats = _state.stats
+        if stats is not None:
+            stats.count('bytes', os.path.getsize(filename))
+        return cls.from_text(text, workers=workers, lazy=lazy, fields=fields)
 
     @classmethod
-    def from_text(cls, source_text):
+    def from_text(cls, source_text, workers: Optional[int] = None, lazy: bool = False,
+                  fields: Optional[Iterable[str]] = None):
         """
         Конструктор полного документа выписки из текста файла
 
         :param source_text: Полный текст файла выписки в формате 1CClientBankExchange
+        :param workers: Количество процессов для разбора документов, см. Document.from_text
+        :param lazy: Создавать LazyDocument, которые разбирают поля при обращении
+        :param fields: Разбираемые поля документов, см. Document.get_projection
         :return: Заполненный объект полного документа выписки
         """
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
+            stats.count('chars', len(source_text))
+
+        document_cls = LazyDocument if lazy else Document
+        header_text, balance_texts, document_texts = cls.split_sections(source_text)
 
         # return source_text
-        return cls(
-            header=Header.from_text(source_text),
-            balance=Balance.from_text(source_text),
-            documents=Document.from_text(source_text)
+        statement = cls(
+            header=Header.from_found(Header.split_lines(header_text)),
+            balances=[Balance.from_found(Balance.split_lines(text)) for text in balance_texts],
+            documents=document_cls.from_section_texts_parallel(document_texts, workers=workers, fields=fields)
         )
+        if stats is not None:
+            stats.add_time('statement.from_text', perf_counter() - started)
+        return statement
+
+    @classmethod
+    def iter_documents(cls, source, encoding: str = 'cp1251', lazy: bool = False,
+                       fields: Optional[Iterable[str]] = None):
+        """
+        Потоковое чтение выписки: заголовок и остатки доступны сразу, документы разбираются по мере чтения файла
+
+        :param source: Путь к файлу или файловый объект (текстовый или бинарный)
+        :param encoding: Кодировка файла, если передан путь или бинарный файловый объект
+        :param lazy: Отдавать LazyDocument, которые разбирают поля при обращении
+        :param fields: Разбираемые поля документов, см. Document.get_projection
+        :return: StatementReader
+        """
+        return StatementReader(source, encoding=encoding, lazy=lazy, fields=fields)
+
+    @classmethod
+    def map_file(cls, filename: str, encoding: str = 'cp1251', lazy: bool = False,
+                 fields: Optional[Iterable[str]] = None):
+        """
+        Отображает файл выписки в память без декодирования, см. MappedStatement
+
+        :param filename: Путь к файлу
+        :param encoding: Кодировка файла
+        :param lazy: Отдавать LazyDocument, которые разбирают поля при обращении
+        :param fields: Разбираемые поля документов, см. Document.get_projection
+        :return: MappedStatement
+        """
+        return MappedStatement(filename, encoding=encoding, lazy=lazy, fields=fields)
+
+    @classmethod
+    def iter_documents_async(cls, stream, encoding: str = 'cp1251', lazy: bool = False,
+                             fields: Optional[Iterable[str]] = None, batch_size: int = 1000, executor=None):
+        """
+        Асинхронное потоковое чтение выписки из асинхронного потока байтов, документы разбираются пачками в executor
+
+        :param stream: asyncio.StreamReader, FileStream или асинхронный итератор частей файла
+        :param encoding: Кодировка потока
+        :param lazy: Отдавать LazyDocument, которые разбирают поля при обращении
+        :param fields: Разбираемые поля документов, см. Document.get_projection
+        :param batch_size: Количество документов в пачке для executor
+        :param executor: concurrent.futures.Executor, по умолчанию пул потоков цикла событий
+        :return: asyncio_client_bank_exchange_1c.AsyncStatementReader
+        """
+        from .asyncio_client_bank_exchange_1c import AsyncStatementReader
+        return AsyncStatementReader(stream, encoding=encoding, lazy=lazy, fields=fields, batch_size=batch_size,
+                                    executor=executor)
 
     @classmethod
     def from_documents(cls, sender: str, documents: List[Document]):
@@ -656,41 +1699,337 @@ class Statement:
         if not payments_from_the_only_bank:
             raise ValueError('Файл для загрузки в банк должен содержать платежи только из одного банка!')
 
-        dates = [doc.date for doc in documents]
+        group = BankGroup(documents[0].payer.bank_bic)
+        for document in documents:
+            group.add(document)
+        return cls(header=group.get_header(sender), balance=None, documents=documents)
 
-        return cls(
-            header=Header(
-                format_version='1.02',
-                encoding='Windows',
-                sender=sender,
-                creation_date=date.today(),
-                creation_time=datetime.now(),
-                filter_date_since=min(dates),
-                filter_date_till=max(dates),
-                filter_account_numbers=set([d.payer.account_number for d in documents])
-            ),
-            balance=None,
-            documents=documents
-        )
+    @classmethod
+    def group_by_bank(cls, documents: Iterable[Document], by_account: bool = False) -> Dict[BankKey, BankGroup]:
+        """
+        Группирует документы по БИК банка плательщика за один проход
+
+        :param documents: документы или генератор документов
+        :param by_account: отдельная группа для каждого счета плательщика
+        :return: словарь (БИК, счет плательщика или None) -> BankGroup в порядке первого появления
+        """
+        groups = {}
+        for document in documents:
+            payer = document.payer
+            key = (payer.bank_bic, payer.account_number if by_account else None)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = BankGroup(payer.bank_bic)
+            group.add(document)
+        return groups
+
+    @classmethod
+    def partition_by_bank(cls, sender: str, documents: Iterable[Document],
+                          by_account: bool = False) -> Dict[BankKey, 'Statement']:
+        """
+        Файлы загрузки в банк для смешанного списка платежей: по выписке на каждый банк плательщика (и счет, если
+        by_account), аналог from_documents для каждой группы
+
+        :param sender: отправитель
+        :param documents: документы или генератор документов
+        :param by_account: отдельная выписка для каждого счета плательщика
+        :return: словарь (БИК, счет плательщика или None) -> Statement
+        """
+        return {
+            key: cls(header=group.get_header(sender), balance=None, documents=group.documents)
+            for key, group in cls.group_by_bank(documents, by_account).items()
+        }
+
+    @classmethod
+    def write_partitions(cls, sender: str, documents: Iterable[Document], directory: str,
+                         filename: str = '{bic}.txt', by_account: bool = False, encoding: str = 'cp1251',
+                         validate=True) -> Dict[BankKey, str]:
+        """
+        Записывает файлы загрузки в банк по partition_by_bank: каждый файл пишется по секциям через write_to,
+        тексты выписок целиком в памяти не собираются
+
+        :param sender: отправитель
+        :param documents: документы или генератор документов
+        :param directory: каталог для файлов
+        :param filename: шаблон имени файла с подстановками {bic} и {account} (счет при by_account, иначе пусто)
+        :param by_account: отдельный файл для каждого счета плательщика
+        :param encoding: кодировка файлов
+        :param validate: проверять обязательные при отправке в банк аттрибуты
+        :return: словарь (БИК, счет плательщика или None) -> путь к файлу
+        """
+        if by_account and '{account}' not in filename:
+            raise ValueError('При группировке по счетам шаблон имени файла должен содержать {account}')
+
+        result = {}
+        for (bic, account), statement in cls.partition_by_bank(sender, documents, by_account).items():
+            path = os.path.join(directory, filename.format(bic=bic, account=account or ''))
+            with open(path, 'wb') as file:
+                statement.write_to(file, encoding=encoding, validate=validate)
+            result[bic, account] = path
+        return result
+
+    def iter_text(self, validate=True):
+        """
+        Тексты секций выписки по одной, без разделителей
+
+        :param validate: проверять обязательные при отправке в банк аттрибуты
+        :return: генератор строк
+        """
+        text = self.header.to_text(validate=validate)
+        if text:
+            yield text
+
+        for balance in self.balances:
+            yield balance.to_text(validate=validate)
+
+        for doc in self.documents or ():
+            text = doc.to_text(validate=validate)
+            if text:
+                yield text
+
+        yield 'КонецФайла'
 
     def to_text(self, validate=True):
-        results = [
-            self.header.to_text(validate=validate),
-            self.balance.to_text(validate=validate) if self.balance else None
-        ]
+        stats = _state.stats
+        if stats is not None:
+            started = perf_counter()
+        text = '\n\n'.join(self.iter_text(validate=validate))
+        if stats is not None:
+            stats.add_time('statement.to_text', perf_counter() - started)
+        return text
+
+    def write_to(self, fileobj, encoding: str = 'cp1251', validate=True):
+        """
+        Записывает выписку в файловый объект по секциям, не собирая полный текст в памяти. Результат совпадает с
+        to_text. При ошибке проверки в файле остается уже записанная часть выписки.
 
-        if self.documents:
-            results.extend([doc.to_text(validate=validate) for doc in self.documents])
+        :param fileobj: текстовый или бинарный файловый объект
+        :param encoding: кодировка для бинарного файлового объекта
+        :param validate: проверять обязательные при отправке в банк аттрибуты
+        """
+        if isinstance(fileobj, io.TextIOBase):
+            write = fileobj.write
+        else:
+            def write(text):
+                fileobj.write(text.encode(encoding))
 
-        results.append('КонецФайла')
+        separator = ''
+        for text in self.iter_text(validate=validate):
+            write(separator + text)
+            separator = '\n\n'
 
-        return '\n\n'.join(filter(lambda x: x, results))
+    async def write_to_async(self, stream, encoding: str = 'cp1251', validate=True, batch_size: int = 1000,
+                             executor=None):
+        """
+        Асинхронный вариант write_to, см. asyncio_client_bank_exchange_1c.write_statement
+        """
+        from .asyncio_client_bank_exchange_1c import write_statement
+        await write_statement(self, stream, encoding=encoding, validate=validate, batch_size=batch_size,
+                              executor=executor)
 
     def __str__(self):
         return self.to_text(validate=False)
 
+    def to_columns(self):
+        """
+        Колоночное представление документов выписки в массивах NumPy, требует numpy
+
+        :return: словарь имя колонки -> массив, см. numpy_client_bank_exchange_1c.documents_to_columns
+        """
+        from .numpy_client_bank_exchange_1c import documents_to_columns
+        return documents_to_columns(self.documents or [])
+
+    def validate(self):
+        """
+        Все нарушения правил отправки в банк, не прерываясь на первом, см. validation.validate
+
+        :return: список validation.Violation, пустой - выписку можно отправлять
+        """
+        from .validation import validate
+        return validate(self)
+
+    def index(self):
+        """
+        Индексы документов для поиска по ИНН, счету, БИК, дате и сумме, см. query.DocumentIndex. Индексы строятся
+        один раз при вызове и учитывают документы, добавленные в конец documents
+
+        :return: query.DocumentIndex
+        """
+        from .query import DocumentIndex
+        return DocumentIndex(self)
+
+    def reconcile(self):
+        """
+        Сверка секций остатков с документами, см. reconciliation.reconcile
+
+        :return: список reconciliation.Mismatch, пустой - выписка сходится
+        """
+        from .reconciliation import reconcile
+        return reconcile(self)
+
     def count(self):
         return len(self.documents)
 
     def total_amount(self):
-        return reduce(lambda x, y: x + y, [doc.amount for doc in self.documents]) if self.documents else 0
+        return sum(doc.amount for doc in self.documents) if self.documents else 0
+
+
+class StatementReader:
+    """
+    Потоковый разбор файла 1CClientBankExchange: header и balance читаются при создании, документы отдаются
+    итератором по мере появления строки *КонецДокумента*, поэтому память не зависит от размера файла
+    """
+
+    def __init__(self, source, encoding: str = 'cp1251', lazy: bool = False, fields: Optional[Iterable[str]] = None):
+        self.document_cls = LazyDocument if lazy else Document
+        self.fields = frozenset(fields) if fields is not None else None
+
+        # Обертка над бинарным файлом вызывающего: при закрытии отсоединяется, иначе закрыла бы и сам файл
+        self.wrapper: Optional[io.TextIOWrapper] = None
+        if isinstance(source, str):
+            self.file = open(source, encoding=encoding)
+            self.own_file = True
+        elif isinstance(source, io.TextIOBase):
+            self.file = source
+            self.own_file = False
+        else:
+            self.file = self.wrapper = io.TextIOWrapper(source, encoding=encoding)
+            self.own_file = False
+
+        self.header: Optional[Header] = None
+        self.balances: List[Balance] = []
+        self._blocks = SectionSplitter.iter_line_sections(self.file)
+        self._pending: Optional[str] = None
+
+        for kind, text in self._blocks:
+            if kind == SectionSplitter.DOCUMENT:
+                self._pending = text
+                break
+            self._handle(kind, text)
+
+    def _handle(self, kind: str, text: str):
+        if kind == SectionSplitter.HEADER:
+            self.header = Header.from_found(Header.split_lines(text))
+        elif kind == SectionSplitter.BALANCE:
+            self.balances.append(Balance.from_found(Balance.split_lines(text)))
+
+    @property
+    def balance(self) -> Optional[Balance]:
+        return self.balances[0] if self.balances else None
+
+    def __iter__(self):
+        try:
+            if self._pending is not None:
+                text, self._pending = self._pending, None
+                yield self.document_cls.from_section_text(text, self.fields)
+            for kind, text in self._blocks:
+                if kind == SectionSplitter.DOCUMENT:
+                    yield self.document_cls.from_section_text(text, self.fields)
+                else:
+                    self._handle(kind, text)
+        finally:
+            self.close()
+
+    def iter_columns(self, chunk_size: int = 100000):
+        """
+        Колоночное представление документов частями не более chunk_size документов, требует numpy
+
+        :param chunk_size: количество документов в части
+        :return: генератор словарей колонок, см. numpy_client_bank_exchange_1c.iter_columns
+        """
+        from .numpy_client_bank_exchange_1c import iter_columns
+        return iter_columns(self, chunk_size=chunk_size)
+
+    def close(self):
+        if self.own_file:
+            self.file.close()
+        elif self.wrapper is not None:
+            wrapper, self.wrapper = self.wrapper, None
+            try:
+                wrapper.detach()
+            except ValueError:
+                # Файл вызывающего уже закрыт
+                pass
+
+    def __del__(self):
+        if getattr(self, 'wrapper', None) is not None:
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def decode_text(data: bytes, encoding: str = 'cp1251') -> str:
+    """
+    Декодирует байты файла так же, как open(..., encoding) в текстовом режиме, с приведением переводов строк к \\n
+    """
+    return data.decode(encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+
+class MappedStatement:
+    """
+    Файл выписки, отображенный в память через mmap. Границы секций ищутся по байтовым маркерам в кодировке файла,
+    а декодируется только текст заголовка, остатков и запрошенных документов. Хранятся лишь смещения документов,
+    поэтому файл любого размера индексируется без декодирования
+    """
+
+    def __init__(self, filename: str, encoding: str = 'cp1251', lazy: bool = False,
+                 fields: Optional[Iterable[str]] = None):
+        self.encoding = encoding
+        self.document_cls = LazyDocument if lazy else Document
+        self.fields = frozenset(fields) if fields is not None else None
+
+        self.file = open(filename, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        self.starts = array('q')
+        self.ends = array('q')
+        self.header: Optional[Header] = None
+        self.balances: List[Balance] = []
+        self.scan()
+
+    @property
+    def balance(self) -> Optional[Balance]:
+        return self.balances[0] if self.balances else None
+
+    def decode(self, start: int, end: int) -> str:
+        return decode_text(self.map[start:end], self.encoding)
+
+    def scan(self):
+        # Один проход SectionSplitter по байтам файла: декодируются только заголовок и остатки
+        for kind, start, end in SectionSplitter.iter_spans(self.map, self.encoding):
+            if kind == SectionSplitter.DOCUMENT:
+                self.starts.append(start)
+                self.ends.append(end)
+            elif kind == SectionSplitter.BALANCE:
+                self.balances.append(Balance.from_found(Balance.split_lines(self.decode(start, end))))
+            elif kind == SectionSplitter.HEADER:
+                self.header = Header.from_found(Header.split_lines(self.decode(start, end)))
+
+    def get_text(self, index: int) -> str:
+        return self.decode(self.starts[index], self.ends[index])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, index: int) -> Document:
+        return self.document_cls.from_section_text(self.get_text(index), self.fields)
+
+    def __iter__(self):
+        for index in range(len(self.starts)):
+            yield self[index]
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -1,10 +1,58 @@
-from typing import List, Optional
+import hashlib
+from itertools import islice
+from time import perf_counter
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Union
 
-from django.db import models
+from django.db import models, transaction
 from client_bank_exchange_1c import (
     Statement, Header, Balance, Document, Payer, Payment, Receipt, Receiver, Special,
     Tax,
 )
+from client_bank_exchange_1c.client_bank_exchange_1c import Cast
+from client_bank_exchange_1c.ingest import FileResult, ingest
+
+
+# Поля DjangoDocument в порядке схемы: поле модели -> аттрибут документа и его подсекций
+DOCUMENT_FIELDS = tuple((field.attr, field.attr) for field in Document.fields)
+SUBSECTION_FIELDS = tuple(
+    (name, tuple((f'{name}_{field.attr}', field.attr) for field in section.fields))
+    for name, section in Document.Subsections.to_dict().items()
+)
+
+
+class BulkResult(NamedTuple):
+    """
+    Итог массового сохранения: количество строк и затраченное время
+    """
+    count: int
+    seconds: float
+
+    @property
+    def per_second(self) -> float:
+        return self.count / self.seconds if self.seconds else 0.0
+
+
+class SyncResult(NamedTuple):
+    """
+    Итог идемпотентного импорта: сколько документов добавлено, обновлено и пропущено без изменений, и сколько
+    документов пачки заменено следующим документом с тем же natural_key. Сумма created, updated, unchanged и
+    duplicates равна количеству переданных документов
+    """
+    created: int
+    updated: int
+    unchanged: int
+    duplicates: int
+    seconds: float
+
+
+class IngestResult(NamedTuple):
+    """
+    Итог загрузки файлов выписок: количество файлов и сохраненных документов, ошибки по файлам и время
+    """
+    files: int
+    documents: int
+    errors: Dict[str, str]
+    seconds: float
 
 
 class DjangoStatement(models.Model):
@@ -156,80 +204,233 @@ class DjangoDocument(models.Model):
     special_supplier_account_number = models.TextField(null=True, blank=True)
     special_docs_sent_date = models.TextField(null=True, blank=True)
 
+    # Не уникален: bulk_from_documents сохраняет документы как есть, а bulk_sync_documents оставляет одну строку
+    # на ключ, см. его описание
+    natural_key = models.CharField(max_length=40, null=True, blank=True, db_index=True)
+    content_hash = models.CharField(max_length=40, null=True, blank=True)
+
     @classmethod
     def from_document(cls, document: Document):
-        return cls(
-            document_type=document.document_type,
-            number=document.number,
-            date=document.date,
-            amount=document.amount,
-
-            receipt_date=document.receipt.date,
-            receipt_time=document.receipt.time,
-            receipt_content=document.receipt.content,
-
-            payer_account=document.payer.account,
-            payer_date_charged=document.payer.date_charged,
-            payer_name=document.payer.name,
-            payer_inn=document.payer.inn,
-            payer_l1_name=document.payer.l1_name,
-            payer_l2_account_number=document.payer.l2_account_number,
-            payer_l3_bank=document.payer.l3_bank,
-            payer_l4_city=document.payer.l4_city,
-            payer_account_number=document.payer.account_number,
-            payer_bank_1_name=document.payer.bank_1_name,
-            payer_bank_2_city=document.payer.bank_2_city,
-            payer_bank_bic=document.payer.bank_bic,
-            payer_bank_corr_account=document.payer.bank_corr_account,
-
-            receiver_account=document.receiver.account,
-            receiver_date_received=document.receiver.date_received,
-            receiver_name=document.receiver.name,
-            receiver_inn=document.receiver.inn,
-            receiver_l1_name=document.receiver.l1_name,
-            receiver_l2_account_number=document.receiver.l2_account_number,
-            receiver_l3_bank=document.receiver.l3_bank,
-            receiver_l4_city=document.receiver.l4_city,
-            receiver_account_number=document.receiver.account_number,
-            receiver_bank_1_name=document.receiver.bank_1_name,
-            receiver_bank_2_city=document.receiver.bank_2_city,
-            receiver_bank_bic=document.receiver.bank_bic,
-            receiver_bank_corr_account=document.receiver.bank_corr_account,
-
-            payment_payment_type=document.payment.payment_type,
-            payment_operation_type=document.payment.operation_type,
-            payment_code=document.payment.code,
-            payment_purpose=document.payment.purpose,
-            payment_purpose_l1=document.payment.purpose_l1,
-            payment_purpose_l2=document.payment.purpose_l2,
-            payment_purpose_l3=document.payment.purpose_l3,
-            payment_purpose_l4=document.payment.purpose_l4,
-            payment_purpose_l5=document.payment.purpose_l5,
-            payment_purpose_l6=document.payment.purpose_l6,
-
-            tax_originator_status=document.tax.originator_status,
-            tax_payer_kpp=document.tax.payer_kpp,
-            tax_receiver_kpp=document.tax.receiver_kpp,
-            tax_kbk=document.tax.kbk,
-            tax_okato=document.tax.okato,
-            tax_basis=document.tax.basis,
-            tax_period=document.tax.period,
-            tax_number=document.tax.number,
-            tax_date=document.tax.date,
-            tax_type=document.tax.type,
-
-            special_priority=document.special.priority,
-            special_term_of_acceptance=document.special.term_of_acceptance,
-            special_letter_of_credit_type=document.special.letter_of_credit_type,
-            special_maturity=document.special.maturity,
-            special_payment_condition_1=document.special.payment_condition_1,
-            special_payment_condition_2=document.special.payment_condition_2,
-            special_payment_condition_3=document.special.payment_condition_3,
-            special_by_submission=document.special.by_submission,
-            special_extra_conditions=document.special.extra_conditions,
-            special_supplier_account_number=document.special.supplier_account_number,
-            special_docs_sent_date=document.special.docs_sent_date
-        )
+        kwargs = {field: getattr(document, attr) for field, attr in DOCUMENT_FIELDS}
+        for name, fields in SUBSECTION_FIELDS:
+            section = getattr(document, name)
+            for field, attr in fields:
+                kwargs[field] = getattr(section, attr) if section is not None else None
+        # В схеме Receiver дата поступления текстовая, а в модели это DateField
+        if isinstance(kwargs['receiver_date_received'], str):
+            kwargs['receiver_date_received'] = Cast.str_to_date(kwargs['receiver_date_received'])
+        kwargs['content_hash'] = hashlib.sha1('\x1f'.join(map(repr, kwargs.values())).encode()).hexdigest()
+        kwargs['natural_key'] = document.get_natural_key()
+        return cls(**kwargs)
+
+    @classmethod
+    def bulk_from_documents(cls, documents: Iterable[Document], batch_size: int = 1000, using: Optional[str] = None,
+                            **extra) -> 'BulkResult':
+        """
+        Сохраняет документы пачками через bulk_create в одной транзакции
+
+        :param documents: документы, в том числе потоковые из Statement.iter_documents
+        :param batch_size: количество строк в одном INSERT
+        :param using: алиас базы данных
+        :param extra: значения дополнительных полей модели для всех строк, например ссылка на выписку
+        :return: BulkResult
+        """
+        started = perf_counter()
+        count = 0
+        manager = cls._default_manager.db_manager(using)
+        documents = iter(documents)
+
+        with transaction.atomic(using=manager.db):
+            while True:
+                batch = [cls.from_document(document) for document in islice(documents, batch_size)]
+                if not batch:
+                    break
+                if extra:
+                    for obj in batch:
+                        for key, value in extra.items():
+                            setattr(obj, key, value)
+                manager.bulk_create(batch, batch_size=batch_size)
+                count += len(batch)
+
+        return BulkResult(count=count, seconds=perf_counter() - started)
+
+    @classmethod
+    def get_sync_columns(cls, fields: Optional[Iterable[str]] = None) -> List[str]:
+        """
+        Поля модели, которые сравниваются и обновляются при идемпотентном импорте
+
+        :param fields: разобранные поля документов, см. Document.get_projection; по умолчанию все
+        :return: список имен полей модели
+        """
+        if fields is None:
+            columns = [field for field, _ in DOCUMENT_FIELDS]
+            columns.extend(field for _, fields in SUBSECTION_FIELDS for field, _ in fields)
+            return columns
+
+        projection = Document.get_projection(frozenset(fields))
+        for path in Document.NATURAL_KEY:
+            name, _, attr = path.rpartition('.')
+            if attr not in {field.attr for field in projection.fields.get(name or None, ())}:
+                raise ValueError(f'Поле {path} из Document.NATURAL_KEY должно входить в fields')
+
+        selected = {field.attr for field in projection.fields[None]}
+        columns = [field for field, attr in DOCUMENT_FIELDS if attr in selected]
+        for name, section_fields in SUBSECTION_FIELDS:
+            selected = {field.attr for field in projection.fields.get(name, ())}
+            columns.extend(field for field, attr in section_fields if attr in selected)
+        return columns
+
+    @classmethod
+    def bulk_sync_documents(cls, documents: Iterable[Document], batch_size: int = 1000, using: Optional[str] = None,
+                            fields: Optional[Iterable[str]] = None, **extra) -> 'SyncResult':
+        """
+        Идемпотентный импорт: документы ищутся по natural_key одним запросом на пачку, новые добавляются через
+        bulk_create, у изменившихся обновляются только отличающиеся поля (отдельный UPDATE на строку: bulk_update
+        по всем полям строит огромный CASE WHEN на каждое поле и на порядок медленнее), остальные пропускаются.
+        Все пачки сохраняются в одной транзакции
+
+        Без fields изменившиеся документы находятся по content_hash. Документы, разобранные с fields= (в том числе
+        LazyDocument), нужно передавать с теми же fields: тогда сравниваются и обновляются только эти поля, а
+        остальные столбцы сохраненных строк не затираются пустыми значениями
+
+        Документы с одинаковым natural_key (см. Document.get_natural_key) считаются одним документом: сохраняется
+        последний из них, как при повторной выгрузке в следующей пачке или файле, а предыдущие в той же пачке
+        учитываются в SyncResult.duplicates
+
+        :param documents: документы, в том числе потоковые из Statement.iter_documents
+        :param batch_size: количество документов в пачке
+        :param using: алиас базы данных
+        :param fields: поля, с которыми разобраны документы, см. Document.get_projection; по умолчанию все
+        :param extra: значения дополнительных полей модели для добавляемых строк
+        :return: SyncResult
+        """
+        started = perf_counter()
+        created = updated = unchanged = duplicates = 0
+        manager = cls._default_manager.db_manager(using)
+        projected = fields is not None
+        projection = Document.get_projection(frozenset(fields)) if projected else None
+        columns = cls.get_sync_columns(fields)
+        model_fields = [cls._meta.get_field(column) for column in columns]
+        documents = iter(documents)
+
+        with transaction.atomic(using=manager.db):
+            while True:
+                batch = {}
+                for document in islice(documents, batch_size):
+                    document_projection = getattr(document, '_projection', None)
+                    if document_projection is not None and document_projection is not projection and (
+                            projection is None or document_projection.fields != projection.fields):
+                        raise ValueError('Документ разобран с fields=, передайте те же fields в bulk_sync_documents')
+                    obj = cls.from_document(document)
+                    if projected:
+                        # Хэш частично разобранного документа не описывает строку целиком
+                        obj.content_hash = None
+                    if obj.natural_key in batch:
+                        duplicates += 1
+                    batch[obj.natural_key] = obj
+                if not batch:
+                    break
+
+                existing = {
+                    key: (pk, content_hash)
+                    for key, pk, content_hash in manager.filter(natural_key__in=list(batch))
+                                                      .values_list('natural_key', 'pk', 'content_hash')
+                }
+
+                to_create, to_compare = [], {}
+                for key, obj in batch.items():
+                    if key not in existing:
+                        for name, value in extra.items():
+                            setattr(obj, name, value)
+                        to_create.append(obj)
+                    elif projected or existing[key][1] != obj.content_hash:
+                        to_compare[existing[key][0]] = obj
+                    else:
+                        unchanged += 1
+
+                if to_create:
+                    manager.bulk_create(to_create, batch_size=batch_size)
+                created += len(to_create)
+
+                stored = manager.filter(pk__in=list(to_compare)).values_list('pk', *columns) if to_compare else ()
+                for pk, *values in stored:
+                    obj = to_compare[pk]
+                    changed = {}
+                    for field, value in zip(model_fields, values):
+                        new_value = field.to_python(getattr(obj, field.attname))
+                        if new_value != value:
+                            changed[field.attname] = new_value
+                    if not changed:
+                        unchanged += 1
+                        if not projected:
+                            # Строка совпадает с документом, но ее хэш устарел, например после импорта с fields
+                            manager.filter(pk=pk).update(content_hash=obj.content_hash)
+                        continue
+                    changed['content_hash'] = obj.content_hash
+                    manager.filter(pk=pk).update(**changed)
+                    updated += 1
+
+        return SyncResult(created=created, updated=updated, unchanged=unchanged, duplicates=duplicates,
+                          seconds=perf_counter() - started)
+
+    @classmethod
+    def bulk_from_statement(cls, statement: Union[Statement, str], batch_size: int = 1000,
+                            using: Optional[str] = None, **extra) -> 'BulkResult':
+        """
+        Сохраняет документы выписки или файла выписки пачками, см. bulk_from_documents. Файл читается потоково
+
+        :param statement: выписка или путь к файлу
+        :param batch_size: количество строк в одном INSERT
+        :param using: алиас базы данных
+        :param extra: значения дополнительных полей модели для всех строк
+        :return: BulkResult
+        """
+        if isinstance(statement, Statement):
+            documents = statement.documents or []
+        else:
+            documents = Statement.iter_documents(statement)
+        return cls.bulk_from_documents(documents, batch_size=batch_size, using=using, **extra)
+
+    @classmethod
+    def bulk_from_files(cls, sources: Union[str, Iterable[str]], workers: Optional[int] = None, batch_size: int = 1000,
+                        using: Optional[str] = None, sync: bool = False, pattern: str = '*.txt',
+                        progress: Callable[[int, int, FileResult], None] = None, **extra) -> 'IngestResult':
+        """
+        Загружает каталог файлов выписок: файлы разбираются в пуле процессов (см. ingest.ingest), а документы
+        каждого файла сохраняются в текущем процессе в отдельной транзакции. Ошибка разбора или сохранения файла не
+        прерывает загрузку остальных и попадает в errors
+
+        :param sources: каталог, маска, путь или их список, см. ingest.find_files
+        :param workers: количество процессов разбора, по умолчанию по числу ядер
+        :param batch_size: количество документов в пачке
+        :param using: алиас базы данных
+        :param sync: идемпотентный импорт через bulk_sync_documents вместо bulk_from_documents
+        :param pattern: маска файлов внутри каталогов
+        :param progress: см. ingest.ingest
+        :param extra: значения дополнительных полей модели для добавляемых строк
+        :return: IngestResult
+        """
+        started = perf_counter()
+        files = documents = 0
+        errors = {}
+
+        for result in ingest(sources, workers=workers, pattern=pattern, progress=progress):
+            files += 1
+            if not result.ok:
+                errors[result.filename] = result.error
+                continue
+            try:
+                if sync:
+                    saved = cls.bulk_sync_documents(result.statement.documents, batch_size=batch_size, using=using,
+                                                    **extra)
+                    documents += saved.created + saved.updated
+                else:
+                    documents += cls.bulk_from_documents(result.statement.documents, batch_size=batch_size,
+                                                         using=using, **extra).count
+            except Exception as e:
+                errors[result.filename] = f'{type(e).__name__}: {e}'
+
+        return IngestResult(files=files, documents=documents, errors=errors, seconds=perf_counter() - started)
 
     # noinspection PyTypeChecker
     def to_document(self):
@@ -260,7 +461,8 @@ class DjangoDocument(models.Model):
             ),
             receiver=Receiver(
                 account=self.receiver_account,
-                date_received=self.receiver_date_received,
+                # В модели дата поступления - DateField, а в схеме Receiver текст, см. from_document
+                date_received=Cast.date_to_str(self.receiver_date_received) or None,
                 name=self.receiver_name,
                 inn=self.receiver_inn,
                 l1_name=self.receiver_l1_name,
@@ -0,0 +1,198 @@
+import json
+import os
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Optional, Set, Union
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Cast, Document, MappedStatement, decode_text
+
+# Увеличивается при изменении формата индекса
+INDEX_FORMAT = 1
+INDEX_SUFFIX = '.idx'
+
+
+class IndexEntry(NamedTuple):
+    """
+    Запись индекса: байтовые границы секции документа и поля для поиска в текстовом виде
+    """
+    start: int
+    end: int
+    number: Optional[str]
+    date: Optional[str]
+    amount: Optional[str]
+    payer_account: Optional[str]
+    receiver_account: Optional[str]
+
+    FIELDS = ('number', 'date', 'amount', 'payer.account', 'receiver.account')
+
+    @classmethod
+    def from_document(cls, start: int, end: int, document: Document):
+        return cls(
+            start=start,
+            end=end,
+            number=document.number,
+            date=Cast.date_to_str(document.date) or None,
+            amount=amount_key(document.amount),
+            payer_account=document.payer.account if document.payer else None,
+            receiver_account=document.receiver.account if document.receiver else None,
+        )
+
+
+def amount_key(amount: Union[Decimal, str, None]) -> Optional[str]:
+    if amount is None:
+        return None
+    return str(Decimal(amount).normalize())
+
+
+def date_key(value: Union[date, str, None]) -> Optional[str]:
+    if isinstance(value, date):
+        return Cast.date_to_str(value)
+    return value
+
+
+class StatementIndex:
+    """
+    Индекс документов файла выписки для произвольного доступа. Хранится рядом с файлом (*<файл>.idx*) и содержит
+    смещения каждой секции СекцияДокумент с номером, датой, суммой и счетами плательщика и получателя. Поиск
+    выполняется по словарям в памяти, а найденный документ читается из файла по смещению и разбирается один
+
+    Индекс перестраивается, если размер или время изменения файла не совпадают с сохраненными
+    """
+
+    def __init__(self, filename: str, entries: List[IndexEntry], encoding: str = 'cp1251'):
+        self.filename = filename
+        self.encoding = encoding
+        self.entries = entries
+        self.by_number: Dict[str, List[int]] = {}
+        self.by_date: Dict[str, List[int]] = {}
+        self.by_amount: Dict[str, List[int]] = {}
+        self.by_account: Dict[str, List[int]] = {}
+
+        for position, entry in enumerate(entries):
+            self.by_number.setdefault(entry.number, []).append(position)
+            self.by_date.setdefault(entry.date, []).append(position)
+            self.by_amount.setdefault(entry.amount, []).append(position)
+            for account in {entry.payer_account, entry.receiver_account}:
+                self.by_account.setdefault(account, []).append(position)
+
+    @staticmethod
+    def get_index_path(filename: str) -> str:
+        return filename + INDEX_SUFFIX
+
+    @staticmethod
+    def get_signature(filename: str) -> List[int]:
+        stat = os.stat(filename)
+        return [INDEX_FORMAT, stat.st_size, stat.st_mtime_ns]
+
+    @classmethod
+    def build(cls, filename: str, encoding: str = 'cp1251', save: bool = True):
+        """
+        Строит индекс по файлу выписки, разбирая только индексируемые поля документов
+
+        :param filename: Путь к файлу
+        :param encoding: Кодировка файла
+        :param save: Сохранить индекс рядом с файлом
+        :return: StatementIndex
+        """
+        signature = cls.get_signature(filename)
+        with MappedStatement(filename, encoding=encoding, fields=IndexEntry.FIELDS) as mapped:
+            entries = [
+                IndexEntry.from_document(start, end, document)
+                for start, end, document in zip(mapped.starts, mapped.ends, mapped)
+            ]
+
+        if save:
+            index_path = cls.get_index_path(filename)
+            temp_path = index_path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'signature': signature, 'encoding': encoding, 'entries': entries}, file,
+                          ensure_ascii=False)
+            os.replace(temp_path, index_path)
+
+        return cls(filename, entries, encoding=encoding)
+
+    @classmethod
+    def open(cls, filename: str, encoding: str = 'cp1251'):
+        """
+        Загружает сохраненный индекс файла выписки или строит его, если индекса нет или он устарел
+
+        :param filename: Путь к файлу
+        :param encoding: Кодировка файла
+        :return: StatementIndex
+        """
+        try:
+            with open(cls.get_index_path(filename), encoding='utf-8') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = None
+
+        if not data or data.get('signature') != cls.get_signature(filename) or data.get('encoding') != encoding:
+            return cls.build(filename, encoding=encoding)
+
+        return cls(filename, [IndexEntry(*entry) for entry in data['entries']], encoding=encoding)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, number: Optional[str] = None, date: Union[date, str, None] = None,
+             amount: Union[Decimal, str, None] = None, account: Optional[str] = None) -> List[IndexEntry]:
+        """
+        Записи индекса, подходящие под все заданные условия, в порядке следования в файле
+
+        :param number: Номер документа
+        :param date: Дата документа, datetime.date или *дд.мм.гггг*
+        :param amount: Сумма
+        :param account: Счет плательщика или получателя
+        :return: список IndexEntry
+        """
+        conditions = [
+            (self.by_number, number),
+            (self.by_date, date_key(date)),
+            (self.by_amount, amount_key(amount)),
+            (self.by_account, account),
+        ]
+        positions: Optional[Set[int]] = None
+        for lookup, value in sorted(
+                ((lookup, value) for lookup, value in conditions if value is not None),
+                key=lambda condition: len(condition[0].get(condition[1], ()))):
+            found = lookup.get(value, ())
+            positions = set(found) if positions is None else positions.intersection(found)
+            if not positions:
+                return []
+
+        if positions is None:
+            return list(self.entries)
+        return [self.entries[position] for position in sorted(positions)]
+
+    def read(self, entry: IndexEntry, fields=None) -> Document:
+        """
+        Читает и разбирает документ по записи индекса
+
+        :param entry: запись индекса
+        :param fields: Разбираемые поля, см. Document.get_projection
+        :return: Document
+        """
+        with open(self.filename, 'rb') as file:
+            file.seek(entry.start)
+            text = decode_text(file.read(entry.end - entry.start), self.encoding)
+        return Document.from_section_text(text, frozenset(fields) if fields is not None else None)
+
+    def query(self, number: Optional[str] = None, date: Union[date, str, None] = None,
+              amount: Union[Decimal, str, None] = None, account: Optional[str] = None) -> List[Document]:
+        """
+        Документы, подходящие под все заданные условия, см. find
+
+        :return: список Document
+        """
+        return [self.read(entry) for entry in self.find(number=number, date=date, amount=amount, account=account)]
+
+    def get(self, number: str, date: Union[date, str, None] = None) -> Optional[Document]:
+        """
+        Документ по номеру и, при необходимости, дате
+
+        :param number: Номер документа
+        :param date: Дата документа
+        :return: первый найденный Document или None
+        """
+        entries = self.find(number=number, date=date)
+        return self.read(entries[0]) if entries else None
@@ -0,0 +1,177 @@
+"""
+Пакетный разбор каталога файлов выписок в пуле процессов
+
+    python -m client_bank_exchange_1c.ingest каталог_или_маска [--workers N] [--pattern *.txt]
+"""
+import argparse
+import glob
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import chain
+from time import perf_counter
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Statement
+
+
+class FileResult(NamedTuple):
+    """
+    Результат разбора одного файла: выписка или текст ошибки, если файл разобрать не удалось
+    """
+    filename: str
+    statement: Optional[Statement]
+    error: Optional[str]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def find_files(sources: Union[str, Iterable[str]], pattern: str = '*.txt') -> List[str]:
+    """
+    Файлы выписок по каталогам, маскам glob и путям к файлам
+
+    :param sources: каталог, маска (в том числе с ** для подкаталогов), путь или их список
+    :param pattern: маска файлов внутри каталогов
+    :return: отсортированный список путей без повторов
+    """
+    if isinstance(sources, str):
+        sources = [sources]
+    filenames = set()
+    for source in sources:
+        if os.path.isdir(source):
+            source = os.path.join(source, pattern)
+        filenames.update(filename for filename in glob.glob(source, recursive=True) if os.path.isfile(filename))
+    return sorted(filenames)
+
+
+def parse_file(filename: str, lazy: bool = False, fields: Optional[Iterable[str]] = None) -> FileResult:
+    """
+    Разбирает один файл; исключение не пробрасывается, а возвращается текстом в FileResult.error
+    """
+    started = perf_counter()
+    try:
+        statement = Statement.from_file(filename, lazy=lazy, fields=fields)
+    except Exception as e:
+        return FileResult(filename, None, f'{type(e).__name__}: {e}', perf_counter() - started)
+    return FileResult(filename, statement, None, perf_counter() - started)
+
+
+def ingest(sources: Union[str, Iterable[str]], workers: Optional[int] = None, max_in_flight: Optional[int] = None,
+           pattern: str = '*.txt', lazy: bool = False, fields: Optional[Iterable[str]] = None,
+           progress: Callable[[int, int, FileResult], None] = None) -> Iterator[FileResult]:
+    """
+    Разбирает файлы выписок в пуле процессов, по файлу на задачу, и отдает результаты по мере готовности
+
+    Одновременно в работе и в очереди на отдачу не больше max_in_flight файлов, поэтому память ограничена
+    независимо от количества файлов. Ошибка разбора файла не прерывает остальные, см. FileResult.error. Если процесс
+    пула завершился аварийно, файлы, бывшие в работе, отдаются с ошибкой BrokenProcessPool, а остальные разбирает
+    новый пул
+
+    :param sources: каталог, маска, путь или их список, см. find_files
+    :param workers: количество процессов, по умолчанию по числу ядер; 1 - разбор в текущем процессе
+    :param max_in_flight: количество файлов в работе, по умолчанию удвоенное количество процессов
+    :param pattern: маска файлов внутри каталогов
+    :param lazy: Создавать LazyDocument, которые разбирают поля при обращении
+    :param fields: Разбираемые поля документов, см. Document.get_projection
+    :param progress: вызывается после каждого файла с количеством готовых, общим количеством и результатом
+    :return: генератор FileResult в порядке готовности
+    """
+    filenames = find_files(sources, pattern)
+    total = len(filenames)
+    fields = tuple(fields) if fields is not None else None
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for done, filename in enumerate(filenames, 1):
+            result = parse_file(filename, lazy, fields)
+            if progress is not None:
+                progress(done, total, result)
+            yield result
+        return
+
+    max_in_flight = max_in_flight or workers * 2
+    pending = iter(filenames)
+    done = 0
+    executor = ProcessPoolExecutor(workers)
+    # Задача -> (файл, время постановки в работу)
+    running = {}
+
+    def submit() -> bool:
+        """
+        Ставит файлы в работу, пока их меньше max_in_flight
+
+        :return: False, если пул сломан и файл не принят
+        """
+        nonlocal pending
+        while len(running) < max_in_flight:
+            filename = next(pending, None)
+            if filename is None:
+                break
+            try:
+                running[executor.submit(parse_file, filename, lazy, fields)] = (filename, perf_counter())
+            except BrokenProcessPool:
+                pending = chain([filename], pending)
+                return False
+        return True
+
+    try:
+        broken = not submit()
+        while running or broken:
+            if not broken:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                broken = any(isinstance(future.exception(), BrokenProcessPool) for future in finished)
+            if broken:
+                # Процесс пула завершился аварийно (например, убит при нехватке памяти на большом файле): все задачи
+                # пула завершаются с BrokenProcessPool, файлы в работе отдаются с ошибкой, остальные разбирает новый пул
+                executor.shutdown()
+                executor = ProcessPoolExecutor(workers)
+                finished = set(running)
+            completed = [(running.pop(future), future) for future in finished]
+            # Следующие файлы ставятся в работу до отдачи результатов, чтобы процессы не простаивали
+            broken = not submit()
+            for (filename, started), future in completed:
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    result = FileResult(filename, None, f'{type(e).__name__}: {e}', perf_counter() - started)
+                done += 1
+                if progress is not None:
+                    progress(done, total, result)
+                yield result
+    finally:
+        executor.shutdown()
+
+
+def print_progress(done: int, total: int, result: FileResult):
+    if result.ok:
+        status = f'{result.statement.count()} документов'
+    else:
+        status = result.error
+    print(f'[{done}/{total}] {result.filename}: {status} ({result.seconds:.2f} с)', file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Разбор файлов выписок 1CClientBankExchange в пуле процессов')
+    parser.add_argument('sources', nargs='+', help='каталоги, маски или файлы')
+    parser.add_argument('--workers', type=int, default=None, help='количество процессов, по умолчанию по ядрам')
+    parser.add_argument('--pattern', default='*.txt', help='маска файлов внутри каталогов')
+    args = parser.parse_args(argv)
+
+    started = perf_counter()
+    files = failed = documents = 0
+    for result in ingest(args.sources, workers=args.workers, pattern=args.pattern, progress=print_progress):
+        files += 1
+        if result.ok:
+            documents += result.statement.count()
+        else:
+            failed += 1
+    print(f'Файлов: {files}, с ошибками: {failed}, документов: {documents}, {perf_counter() - started:.1f} с')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
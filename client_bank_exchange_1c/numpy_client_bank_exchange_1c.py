@@ -0,0 +1,120 @@
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from client_bank_exchange_1c import Document
+from client_bank_exchange_1c.client_bank_exchange_1c import CompiledField, Type
+
+NAT = np.iinfo(np.int64).min
+
+
+class Column(NamedTuple):
+    """
+    Колонка документов: имя в стиле полей DjangoDocument (*payer_inn*), путь к аттрибуту и поле схемы
+    """
+    name: str
+    subsection: Optional[str]
+    field: CompiledField
+
+
+def get_columns(document_cls=Document) -> Tuple[Column, ...]:
+    """
+    Колонки для всех полей документа и его подсекций в порядке схемы
+
+    :param document_cls: класс документа
+    :return: кортеж Column
+    """
+    columns = [Column(field.attr, None, field) for field in document_cls.fields]
+    for name, section in document_cls.Subsections.to_dict().items():
+        columns.extend(Column(f'{name}_{field.attr}', name, field) for field in section.fields)
+    return tuple(columns)
+
+
+def amount_to_kopecks(amount: Optional[Decimal]) -> int:
+    """
+    Сумма в копейках, дробные копейки округляются по правилам бухгалтерии
+
+    :param amount: сумма в рублях
+    :return: целое число копеек или NAT для пустой суммы
+    """
+    if amount is None:
+        return NAT
+    return int(Decimal(amount).scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def to_array(field: CompiledField, values: List) -> np.ndarray:
+    """
+    Конвертирует значения поля в массив NumPy
+
+    * DATE - datetime64[D], пустые значения NaT
+    * TIME - timedelta64[s] от начала суток, пустые значения NaT
+    * AMOUNT - int64 в копейках в маскированном массиве, пустые значения замаскированы
+    * остальные - строки фиксированной ширины, пустые значения ''
+
+    :param field: поле схемы
+    :param values: значения аттрибута по документам
+    :return: массив
+    """
+    field_type = field.field.type
+    if field_type == Type.DATE:
+        return np.array(values, dtype='datetime64[D]')
+    elif field_type == Type.TIME:
+        seconds = [NAT if t is None else t.hour * 3600 + t.minute * 60 + t.second for t in values]
+        return np.array(seconds, dtype=np.int64).view('timedelta64[s]')
+    elif field_type == Type.AMOUNT:
+        kopecks = np.array([amount_to_kopecks(amount) for amount in values], dtype=np.int64)
+        return np.ma.masked_equal(kopecks, NAT, copy=False)
+    else:
+        return np.array(['' if value is None else str(value) for value in values], dtype=str)
+
+
+def documents_to_columns(documents: Iterable[Document], columns: Tuple[Column, ...] = None) -> Dict[str, np.ndarray]:
+    """
+    Колоночное представление документов
+
+    :param documents: документы
+    :param columns: колонки, по умолчанию get_columns()
+    :return: словарь имя колонки -> массив, см. to_array
+    """
+    columns = columns or get_columns()
+    values = {column.name: [] for column in columns}
+    appends = [(values[column.name].append, column.subsection, column.field.attr) for column in columns]
+
+    for document in documents:
+        for append, subsection, attr in appends:
+            section = document if subsection is None else getattr(document, subsection)
+            append(None if section is None else getattr(section, attr, None))
+
+    return {column.name: to_array(column.field, values[column.name]) for column in columns}
+
+
+def iter_columns(documents: Iterable[Document], chunk_size: int = 100000,
+                 columns: Tuple[Column, ...] = None) -> Iterator[Dict[str, np.ndarray]]:
+    """
+    Потоковый вариант documents_to_columns: отдает колонки частями не более chunk_size документов
+
+    :param documents: документы, например Statement.iter_documents(...)
+    :param chunk_size: количество документов в части
+    :param columns: колонки, по умолчанию get_columns()
+    :return: генератор словарей колонок
+    """
+    columns = columns or get_columns()
+    chunk = []
+    for document in documents:
+        chunk.append(document)
+        if len(chunk) >= chunk_size:
+            yield documents_to_columns(chunk, columns)
+            chunk = []
+    if chunk:
+        yield documents_to_columns(chunk, columns)
+
+
+def categorize(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Категориальное представление строковой колонки (счета, ИНН, БИК) для группировки
+
+    :param column: массив строк
+    :return: пара (коды int32, уникальные значения)
+    """
+    categories, codes = np.unique(column, return_inverse=True)
+    return codes.astype(np.int32), categories
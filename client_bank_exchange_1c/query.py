@@ -0,0 +1,191 @@
+"""
+Индексы документов разобранной выписки в памяти для поиска по контрагенту, счету, дате и сумме
+
+    index = statement.index()
+    index.find(inn='7707083893', date_since=date(2018, 1, 1), date_till=date(2018, 1, 31), amount_min=1000)
+
+Индексы строятся один раз: словари по ИНН, счету и БИК плательщика и получателя и отсортированные списки дат и
+сумм. Поиск начинается с самого узкого условия, остальные проверяются только у найденных им документов.
+Документы, добавленные в конец statement.documents (или через append), индексируются при следующем запросе;
+после других изменений списка нужен rebuild.
+"""
+from bisect import bisect_left, bisect_right
+from datetime import date
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Document, Statement
+
+
+def get_inns(document: Document) -> Set[str]:
+    return {section.inn for section in (document.payer, document.receiver) if section is not None and section.inn}
+
+
+def get_accounts(document: Document) -> Set[str]:
+    return {
+        account
+        for section in (document.payer, document.receiver) if section is not None
+        for account in (section.account, section.account_number) if account
+    }
+
+
+def get_bics(document: Document) -> Set[str]:
+    return {
+        section.bank_bic for section in (document.payer, document.receiver) if section is not None and section.bank_bic
+    }
+
+
+class SortedIndex:
+    """
+    Отсортированные значения с номерами документов для поиска по диапазону
+    """
+
+    def __init__(self, items: List[Tuple[Any, int]] = ()):
+        items = sorted(items)
+        self.keys = [key for key, _ in items]
+        self.positions = [position for _, position in items]
+
+    def add(self, key, position: int):
+        # Документы обычно добавляются в порядке дат, тогда вставка происходит в конец списка
+        index = bisect_right(self.keys, key)
+        self.keys.insert(index, key)
+        self.positions.insert(index, position)
+
+    def bounds(self, low=None, high=None) -> Tuple[int, int]:
+        start = 0 if low is None else bisect_left(self.keys, low)
+        end = len(self.keys) if high is None else bisect_right(self.keys, high)
+        return start, max(start, end)
+
+
+class DocumentIndex:
+    """
+    Индексы документов выписки, см. Statement.index
+
+    :param statement: выписка с разобранными документами
+    """
+
+    def __init__(self, statement: Statement):
+        self.statement = statement
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Строит индексы заново по текущему списку документов выписки
+        """
+        self.documents: Optional[List[Document]] = self.statement.documents
+        self.size = 0
+        self.by_inn: Dict[str, List[int]] = {}
+        self.by_account: Dict[str, List[int]] = {}
+        self.by_bic: Dict[str, List[int]] = {}
+
+        documents = self.documents or ()
+        for position, document in enumerate(documents):
+            self.add_hashed(position, document)
+        self.by_date = SortedIndex(
+            (document.date, position) for position, document in enumerate(documents) if document.date is not None
+        )
+        self.by_amount = SortedIndex(
+            (document.amount, position) for position, document in enumerate(documents) if document.amount is not None
+        )
+        self.size = len(documents)
+
+    def add_hashed(self, position: int, document: Document):
+        for lookup, values in ((self.by_inn, get_inns(document)), (self.by_account, get_accounts(document)),
+                               (self.by_bic, get_bics(document))):
+            for value in values:
+                lookup.setdefault(value, []).append(position)
+
+    def refresh(self):
+        """
+        Индексирует документы, добавленные в конец списка после построения; если список заменен - строит заново
+        """
+        if self.statement.documents is not self.documents:
+            self.rebuild()
+            return
+        documents = self.documents or ()
+        for position in range(self.size, len(documents)):
+            document = documents[position]
+            self.add_hashed(position, document)
+            if document.date is not None:
+                self.by_date.add(document.date, position)
+            if document.amount is not None:
+                self.by_amount.add(document.amount, position)
+        self.size = len(documents)
+
+    def append(self, document: Document):
+        """
+        Добавляет документ в выписку и в индексы
+        """
+        if self.statement.documents is None:
+            self.statement.documents = self.documents = []
+        self.statement.documents.append(document)
+        self.refresh()
+
+    def __len__(self):
+        self.refresh()
+        return self.size
+
+    def find_positions(self, inn: Optional[str] = None, account: Optional[str] = None, bic: Optional[str] = None,
+                       date_since: Optional[date] = None, date_till: Optional[date] = None,
+                       amount_min: Optional[Decimal] = None, amount_max: Optional[Decimal] = None) -> List[int]:
+        """
+        Номера документов, подходящих под все заданные условия, см. find
+
+        :return: отсортированный список номеров документов в statement.documents
+        """
+        self.refresh()
+        # Кандидаты каждого условия: (количество, получение номеров, проверка документа)
+        conditions: List[Tuple[int, Callable[[], List[int]], Callable[[Document], bool]]] = []
+        for lookup, value, get_values in ((self.by_inn, inn, get_inns), (self.by_account, account, get_accounts),
+                                          (self.by_bic, bic, get_bics)):
+            if value is not None:
+                found = lookup.get(value, [])
+                conditions.append((len(found), lambda found=found: found,
+                                   lambda document, value=value, get_values=get_values: value in get_values(document)))
+
+        for sorted_index, low, high, attr in ((self.by_date, date_since, date_till, 'date'),
+                                              (self.by_amount, amount_min, amount_max, 'amount')):
+            if low is not None or high is not None:
+                if attr == 'amount':
+                    low = Decimal(low) if low is not None else None
+                    high = Decimal(high) if high is not None else None
+                start, end = sorted_index.bounds(low, high)
+                conditions.append((
+                    end - start,
+                    lambda sorted_index=sorted_index, start=start, end=end: sorted_index.positions[start:end],
+                    lambda document, attr=attr, low=low, high=high: (
+                        getattr(document, attr) is not None and (low is None or getattr(document, attr) >= low) and
+                        (high is None or getattr(document, attr) <= high)
+                    ),
+                ))
+
+        if not conditions:
+            return list(range(self.size))
+
+        conditions.sort(key=lambda condition: condition[0])
+        _, get_positions, _ = conditions[0]
+        checks = [check for _, _, check in conditions[1:]]
+        documents = self.documents
+        return sorted(
+            position for position in set(get_positions())
+            if all(check(documents[position]) for check in checks)
+        )
+
+    def find(self, inn: Optional[str] = None, account: Optional[str] = None, bic: Optional[str] = None,
+             date_since: Optional[date] = None, date_till: Optional[date] = None,
+             amount_min: Optional[Decimal] = None, amount_max: Optional[Decimal] = None) -> List[Document]:
+        """
+        Документы, подходящие под все заданные условия, в порядке выписки
+
+        :param inn: ИНН плательщика или получателя
+        :param account: Счет плательщика или получателя (ПлательщикСчет или ПлательщикРасчСчет и т.п.)
+        :param bic: БИК банка плательщика или получателя
+        :param date_since: Дата документа не раньше, включительно
+        :param date_till: Дата документа не позже, включительно
+        :param amount_min: Сумма не меньше, включительно
+        :param amount_max: Сумма не больше, включительно
+        :return: список Document
+        """
+        positions = self.find_positions(inn=inn, account=account, bic=bic, date_since=date_since,
+                                        date_till=date_till, amount_min=amount_min, amount_max=amount_max)
+        return [self.documents[position] for position in positions]
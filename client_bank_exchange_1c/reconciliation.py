@@ -0,0 +1,185 @@
+"""
+Потоковые итоги по документам выписки и сверка с секциями остатков
+
+Итоги копятся по мере прохода документов (в том числе из StatementReader), документы не хранятся, поэтому память
+зависит только от количества счетов и дней, а не от размера выписки:
+
+    with Statement.iter_documents('выписка.txt') as reader:
+        aggregator = StatementAggregator().update(reader)
+    mismatches = aggregator.reconcile(reader.balances)
+"""
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Balance, Cast, Document, Statement
+
+INCOME = 'income'
+EXPENSE = 'expense'
+ZERO = Decimal('0.00')
+
+
+class Totals(NamedTuple):
+    """
+    Количество и сумма документов
+    """
+    count: int = 0
+    amount: Decimal = ZERO
+
+    def __add__(self, other: 'Totals') -> 'Totals':
+        return Totals(self.count + other.count, self.amount + other.amount)
+
+
+class Mismatch(NamedTuple):
+    """
+    Расхождение секции остатков: счет, аттрибут Balance, значение в секции и значение по документам
+    """
+    account: str
+    attr: str
+    expected: Optional[Decimal]
+    actual: Optional[Decimal]
+
+
+def get_account(section) -> Optional[str]:
+    if section is None:
+        return None
+    return section.account or section.account_number
+
+
+def get_date_charged(document: Document) -> Optional[date]:
+    """
+    День списания: ДатаСписано, а если она не заполнена - дата документа
+    """
+    payer = document.payer
+    return (payer.date_charged if payer is not None else None) or document.date
+
+
+def get_date_received(document: Document) -> Optional[date]:
+    """
+    День поступления: ДатаПоступило, а если она не заполнена или не разбирается - дата документа
+    """
+    receiver = document.receiver
+    value = receiver.date_received if receiver is not None else None
+    if isinstance(value, str):
+        try:
+            value = Cast.str_to_date(value.strip())
+        except ValueError:
+            value = None
+    return value or document.date
+
+
+class StatementAggregator:
+    """
+    Количество и сумма документов по счету, дню движения денег и направлению: списание - счет плательщика и
+    ДатаСписано, поступление - счет получателя и ДатаПоступило; без этих дат учитывается дата документа, так же
+    обороты считает банк в секции остатков. Перевод между двумя своими счетами учитывается у обоих
+
+    :param accounts: учитываемые счета, например счета секций остатков; по умолчанию все счета документов
+    """
+
+    def __init__(self, accounts: Optional[Iterable[str]] = None):
+        self.accounts = frozenset(accounts) if accounts is not None else None
+        # (счет, день, направление) -> [количество, сумма]
+        self.totals: Dict[Tuple[str, Optional[date], str], List] = {}
+        self.count = 0
+        self.amount = ZERO
+
+    def add(self, document: Document):
+        amount = document.amount or ZERO
+        self.count += 1
+        self.amount += amount
+
+        accounts = self.accounts
+        totals = self.totals
+        for direction, account, get_day in ((EXPENSE, get_account(document.payer), get_date_charged),
+                                            (INCOME, get_account(document.receiver), get_date_received)):
+            if account is None or accounts is not None and account not in accounts:
+                continue
+            key = (account, get_day(document), direction)
+            total = totals.get(key)
+            if total is None:
+                totals[key] = [1, amount]
+            else:
+                total[0] += 1
+                total[1] += amount
+
+    def update(self, documents: Iterable[Document]) -> 'StatementAggregator':
+        """
+        Добавляет документы за один проход
+
+        :param documents: документы, генератор или StatementReader
+        :return: self
+        """
+        add = self.add
+        for document in documents:
+            add(document)
+        return self
+
+    def get_totals(self, account: str, direction: str, date_since: Optional[date] = None,
+                   date_till: Optional[date] = None) -> Totals:
+        """
+        Итог по счету и направлению за период, границы включаются; документы без даты учитываются только без границ
+        """
+        result = Totals()
+        for (key_account, day, key_direction), (count, amount) in self.totals.items():
+            if key_account != account or key_direction != direction:
+                continue
+            if day is None:
+                if date_since is not None or date_till is not None:
+                    continue
+            elif date_since is not None and day < date_since or date_till is not None and day > date_till:
+                continue
+            result += Totals(count, amount)
+        return result
+
+    def by_day(self, account: str) -> Dict[Optional[date], Dict[str, Totals]]:
+        """
+        Итоги счета по дням
+
+        :return: словарь день -> {INCOME: Totals, EXPENSE: Totals} в порядке дней
+        """
+        result = {}
+        for (key_account, day, direction), (count, amount) in self.totals.items():
+            if key_account == account:
+                result.setdefault(day, {INCOME: Totals(), EXPENSE: Totals()})[direction] = Totals(count, amount)
+        return dict(sorted(result.items(), key=lambda item: (item[0] is None, item[0] or date.min)))
+
+    def get_accounts(self) -> List[str]:
+        return sorted({account for account, _, _ in self.totals})
+
+    def reconcile(self, balances: Iterable[Balance]) -> List[Mismatch]:
+        """
+        Сверка секций остатков с документами: обороты за период секции должны совпадать с суммами документов, а
+        конечный остаток - с начальным плюс поступления минус списания
+
+        :param balances: секции остатков
+        :return: список расхождений, пустой - выписка сходится
+        """
+        mismatches = []
+        for balance in balances:
+            account = balance.account_number
+            income = self.get_totals(account, INCOME, balance.date_since, balance.date_till).amount
+            expense = self.get_totals(account, EXPENSE, balance.date_since, balance.date_till).amount
+            if balance.total_income is not None and balance.total_income != income:
+                mismatches.append(Mismatch(account, 'total_income', balance.total_income, income))
+            if balance.total_expense is not None and balance.total_expense != expense:
+                mismatches.append(Mismatch(account, 'total_expense', balance.total_expense, expense))
+            if balance.initial_balance is not None and balance.final_balance is not None:
+                final = balance.initial_balance + income - expense
+                if balance.final_balance != final:
+                    mismatches.append(Mismatch(account, 'final_balance', balance.final_balance, final))
+        return mismatches
+
+
+def reconcile(statement: Statement) -> List[Mismatch]:
+    """
+    Сверка выписки, учитываются только счета секций остатков
+
+    :param statement: Statement или StatementReader; у StatementReader документы читаются из файла
+    :return: список расхождений, см. StatementAggregator.reconcile
+    """
+    documents = (statement.documents or ()) if isinstance(statement, Statement) else statement
+    # Секции остатков, записанные после документов, станут известны только после прохода: тогда учитываются все счета
+    accounts = [balance.account_number for balance in statement.balances] or None
+    aggregator = StatementAggregator(accounts).update(documents)
+    return aggregator.reconcile(statement.balances)
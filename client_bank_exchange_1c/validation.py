@@ -0,0 +1,268 @@
+"""
+Пакетная проверка платежных документов перед отправкой в банк
+
+Правила строятся один раз по флагам Required.TO_BANK схем секций, документы проверяются за один проход без
+построения текста, а результатом является список всех нарушений с номерами документов.
+"""
+import re
+from decimal import Decimal
+from functools import lru_cache
+from operator import mul
+from typing import Any, Callable, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from client_bank_exchange_1c.client_bank_exchange_1c import Document, Header, Section, Statement
+
+DIGITS_REGEX = re.compile(r'[0-9]+')
+KPP_REGEX = re.compile(r'[0-9]{4}[0-9A-Z]{2}[0-9]{3}')
+
+INN_10_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN_11_WEIGHTS = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+INN_12_WEIGHTS = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+ACCOUNT_WEIGHTS = (7, 1, 3) * 8
+REQUIRED_MESSAGE = 'Обязательный при отправке в банк аттрибут {key} не содержит значения'
+
+
+class Violation(NamedTuple):
+    """
+    Нарушение: номер документа (от нуля, None для заголовка), путь к аттрибуту (*payer.inn*), ключ поля в
+    формате 1CClientBankExchange и описание
+    """
+    index: Optional[int]
+    path: str
+    key: str
+    message: str
+
+
+def is_empty(value: Any) -> bool:
+    """
+    Значение, для которого to_text не выведет ничего после *КЛЮЧ=*
+    """
+    if value.__class__ is str:
+        return not value.strip()
+    if value is None:
+        return True
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return not value
+    return False
+
+
+def inn_checksum(digits: str, weights: Tuple[int, ...]) -> int:
+    return sum(map(mul, map(int, digits), weights)) % 11 % 10
+
+
+# Одни и те же ИНН и счета повторяются во многих документах, поэтому результаты проверок кэшируются
+@lru_cache(maxsize=1 << 16)
+def check_inn(inn: str) -> Optional[str]:
+    """
+    ИНН организации (10 цифр) или физического лица (12 цифр) с контрольными разрядами, *0* - ИНН отсутствует
+    """
+    if inn == '0':
+        return None
+    if not DIGITS_REGEX.fullmatch(inn) or len(inn) not in (10, 12):
+        return 'ИНН должен состоять из 10 или 12 цифр'
+    if len(inn) == 10:
+        valid = inn_checksum(inn, INN_10_WEIGHTS) == int(inn[9])
+    else:
+        valid = inn_checksum(inn, INN_11_WEIGHTS) == int(inn[10]) and inn_checksum(inn, INN_12_WEIGHTS) == int(inn[11])
+    return None if valid else 'Неверные контрольные разряды ИНН'
+
+
+def check_kpp(kpp: str) -> Optional[str]:
+    if kpp == '0' or KPP_REGEX.fullmatch(kpp):
+        return None
+    return 'КПП должен состоять из 9 символов: 4 цифры, 2 цифры или заглавные латинские буквы, 3 цифры'
+
+
+def check_bic(bic: str) -> Optional[str]:
+    if DIGITS_REGEX.fullmatch(bic) and len(bic) == 9:
+        return None
+    return 'БИК должен состоять из 9 цифр'
+
+
+def check_account(account: str) -> Optional[str]:
+    if DIGITS_REGEX.fullmatch(account) and len(account) == 20:
+        return None
+    return 'Номер счета должен состоять из 20 цифр'
+
+
+def check_amount(amount: Any) -> Optional[str]:
+    if isinstance(amount, Decimal) and amount <= 0:
+        return 'Сумма платежа должна быть больше нуля'
+    return None
+
+
+@lru_cache(maxsize=1 << 16)
+def account_key_is_valid(account: str, bic: str, corr: bool = False) -> bool:
+    """
+    Проверка контрольного ключа номера счета по БИК: счет в кредитной организации проверяется с тремя последними
+    цифрами БИК, счет в подразделении Банка России или ТОФК (БИК начинается с *00*) и корреспондентский счет -
+    с *0* и 5-6 цифрами БИК
+
+    :param account: номер счета, 20 цифр
+    :param bic: БИК, 9 цифр
+    :param corr: корреспондентский счет
+    :return: ключ верен
+    """
+    prefix = '0' + bic[4:6] if corr or bic.startswith('00') or bic[6:] in ('000', '001', '002') else bic[6:]
+    return sum(map(mul, map(int, prefix + account), ACCOUNT_WEIGHTS)) % 10 == 0
+
+
+def account_control_key(account: str, bic: str, corr: bool = False) -> str:
+    """
+    Номер счета с правильным контрольным ключом (9-й разряд), см. account_key_is_valid
+    """
+    for key in '0123456789':
+        candidate = account[:8] + key + account[9:]
+        if account_key_is_valid(candidate, bic, corr):
+            return candidate
+    raise ValueError(f'Нет контрольного ключа для счета {account}')
+
+
+# Проверки формата значений: (подсекция или None, аттрибут, проверка). Пустые значения не проверяются
+VALUE_CHECKS: Tuple[Tuple[Optional[str], str, Callable[[Any], Optional[str]]], ...] = (
+    (None, 'amount', check_amount),
+    ('payer', 'inn', check_inn),
+    ('payer', 'account', check_account),
+    ('payer', 'account_number', check_account),
+    ('payer', 'bank_bic', check_bic),
+    ('payer', 'bank_corr_account', check_account),
+    ('receiver', 'inn', check_inn),
+    ('receiver', 'account', check_account),
+    ('receiver', 'account_number', check_account),
+    ('receiver', 'bank_bic', check_bic),
+    ('receiver', 'bank_corr_account', check_account),
+    ('tax', 'payer_kpp', check_kpp),
+    ('tax', 'receiver_kpp', check_kpp),
+)
+
+# Контрольный ключ счета по БИК: (подсекция, аттрибут счета, корреспондентский счет)
+ACCOUNT_KEY_CHECKS = (
+    ('payer', 'account_number', False),
+    ('payer', 'bank_corr_account', True),
+    ('receiver', 'account_number', False),
+    ('receiver', 'bank_corr_account', True),
+)
+
+# Подсекции, обязательные поля которых проверяются только у заполненной подсекции с заданным аттрибутом:
+# реквизиты платежа в бюджет нужны, если указан статус составителя
+CONDITIONAL_SUBSECTIONS = {'tax': 'originator_status'}
+
+
+def get_required(section: type) -> Tuple[Tuple[str, str], ...]:
+    """
+    Обязательные при отправке в банк поля секции
+
+    :param section: класс секции
+    :return: кортеж пар (аттрибут, ключ)
+    """
+    return tuple((field.attr, field.key) for field in section.fields if field.required and not field.is_flag)
+
+
+class Validator:
+    """
+    Проверка документов по таблицам правил, построенным при создании по схемам классов заголовка и документа
+    """
+
+    def __init__(self, document_cls: type = Document, header_cls: type = Header):
+        self.header_required = get_required(header_cls)
+        self.document_required = get_required(document_cls)
+        self.subsections = tuple(
+            (name, get_required(section), CONDITIONAL_SUBSECTIONS.get(name))
+            for name, section in document_cls.Subsections.to_dict().items()
+        )
+        keys = {(None, field.attr): field.key for field in document_cls.fields}
+        for name, section in document_cls.Subsections.to_dict().items():
+            keys.update({(name, field.attr): field.key for field in section.fields})
+        self.value_checks = tuple(
+            (name, attr, keys[name, attr], check) for name, attr, check in VALUE_CHECKS
+        )
+        self.account_key_checks = tuple(
+            (name, attr, keys[name, attr], corr) for name, attr, corr in ACCOUNT_KEY_CHECKS
+        )
+
+    def validate_header(self, header: Optional[Section]) -> List[Violation]:
+        if header is None:
+            return [Violation(None, 'header', '', 'Нет заголовка файла')]
+        return [
+            Violation(None, f'header.{attr}', key, REQUIRED_MESSAGE.format(key=key))
+            for attr, key in self.header_required if is_empty(getattr(header, attr, None))
+        ]
+
+    def validate_documents(self, documents: Iterable[Document], start: int = 0) -> List[Violation]:
+        """
+        Проверяет документы за один проход
+
+        :param documents: документы
+        :param start: номер первого документа
+        :return: список нарушений в порядке документов
+        """
+        violations = []
+        append = violations.append
+        document_required = self.document_required
+        subsections = self.subsections
+        value_checks = self.value_checks
+        account_key_checks = self.account_key_checks
+
+        for index, document in enumerate(documents, start):
+            for attr, key in document_required:
+                if is_empty(getattr(document, attr, None)):
+                    append(Violation(index, attr, key, REQUIRED_MESSAGE.format(key=key)))
+
+            for name, required, condition in subsections:
+                section = getattr(document, name, None)
+                if condition is not None and (section is None or is_empty(getattr(section, condition, None))):
+                    continue
+                if section is None:
+                    if required:
+                        append(Violation(index, name, '', f'Нет подсекции {name}'))
+                    continue
+                for attr, key in required:
+                    if is_empty(getattr(section, attr, None)):
+                        append(Violation(index, f'{name}.{attr}', key, REQUIRED_MESSAGE.format(key=key)))
+
+            for name, attr, key, check in value_checks:
+                section = document if name is None else getattr(document, name, None)
+                value = getattr(section, attr, None) if section is not None else None
+                if not is_empty(value):
+                    message = check(value)
+                    if message is not None:
+                        append(Violation(index, attr if name is None else f'{name}.{attr}', key,
+                                         f'{message}: {key}={value}'))
+
+            for name, attr, key, corr in account_key_checks:
+                section = getattr(document, name, None)
+                if section is None:
+                    continue
+                account, bic = getattr(section, attr, None), getattr(section, 'bank_bic', None)
+                if is_empty(account) or is_empty(bic) or check_account(account) or check_bic(bic):
+                    continue
+                if not account_key_is_valid(account, bic, corr):
+                    append(Violation(index, f'{name}.{attr}', key,
+                                     f'Контрольный ключ счета {account} не соответствует БИК {bic}'))
+
+        return violations
+
+    def validate(self, statement_or_documents: Union[Statement, Iterable[Document]]) -> List[Violation]:
+        """
+        Все нарушения выписки (заголовок и документы) или списка документов
+
+        :param statement_or_documents: Statement или документы
+        :return: список Violation, пустой - документы можно отправлять
+        """
+        if isinstance(statement_or_documents, Statement):
+            return (self.validate_header(statement_or_documents.header) +
+                    self.validate_documents(statement_or_documents.documents or ()))
+        return self.validate_documents(statement_or_documents)
+
+
+_validator: Optional[Validator] = None
+
+
+def validate(statement_or_documents: Union[Statement, Iterable[Document]]) -> List[Violation]:
+    """
+    Проверка стандартным Validator, см. Validator.validate
+    """
+    global _validator
+    if _validator is None:
+        _validator = Validator()
+    return _validator.validate(statement_or_documents)
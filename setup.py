@@ -25,7 +25,7 @@ test_requirements = [
 
 setup(
     name='client_bank_exchange_1c',
-    version='0.1.8',
+    version='0.2.0',
     description="Handling of 1CClientBankExchange format",
     # long_description=readme + '\n\n' + history,
     author="Denis Kim",
@@ -37,6 +37,11 @@ setup(
     license="GNU General Public License v3",
     zip_safe=False,
     keywords='client_bank_exchange_1c',
+    entry_points={
+        'console_scripts': [
+            'client-bank-exchange-ingest=client_bank_exchange_1c.ingest:main',
+        ],
+    },
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
@@ -45,7 +50,7 @@ setup(
         'Natural Language :: Russian',
         'Programming Language :: Python :: 3.6.4',
     ],
-    # test_suite='tests',
+    test_suite='tests',
     # tests_require=test_requirements,
     # setup_requires=setup_requirements,
 )
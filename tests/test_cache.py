@@ -0,0 +1,61 @@
+"""
+Дисковый кэш разобранных выписок
+"""
+import inspect
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from client_bank_exchange_1c import Statement
+from client_bank_exchange_1c.cache import CachedDocument, StatementCache, get_parser_fingerprint
+
+from tests.test_structure import STATEMENT_TEXT
+
+
+class StatementCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'statement.txt')
+        with open(self.filename, 'w', encoding='cp1251') as file:
+            file.write(STATEMENT_TEXT)
+        self.cache = StatementCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        expected = Statement.from_file(self.filename).to_text()
+        key = self.cache.get_key(self.filename)
+        self.assertIsNone(self.cache.get(key))
+        self.assertEqual(self.cache.from_file(self.filename).to_text(), expected)
+        self.assertEqual(self.cache.get(key).to_text(), expected)
+
+        statement = self.cache.from_file(self.filename, lazy=True)
+        self.assertIsInstance(statement.documents[0], CachedDocument)
+        self.assertEqual(statement.to_text(), expected)
+
+    def test_corrupt_entry_is_miss(self):
+        self.cache.from_file(self.filename)
+        key = self.cache.get_key(self.filename)
+        path = self.cache.get_path(key)
+        for data in (b'', b'garbage', b'{}\n', b'{"table": 1}\n\x00\x00\x00\x00'):
+            with self.subTest(data=data):
+                with open(path, 'wb') as file:
+                    file.write(data)
+                self.assertIsNone(self.cache.get(key))
+                self.assertFalse(os.path.exists(path))
+
+    def test_fingerprint_without_sources(self):
+        # Установка без исходных текстов: отпечаток берется из файла модуля, кэш по-прежнему создается
+        with mock.patch.object(inspect, 'getsource', side_effect=OSError('could not get source code')):
+            fingerprint = get_parser_fingerprint()
+            cache = StatementCache(os.path.join(self.directory, 'cache'))
+        self.assertEqual(len(fingerprint), 40)
+        self.assertEqual(cache.from_file(self.filename).to_text(), Statement.from_file(self.filename).to_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Сохранение документов в Django-модель на SQLite в памяти
+"""
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from client_bank_exchange_1c import Document, LazyDocument, Payer, Payment, Receiver
+
+try:
+    import django
+except ImportError:
+    django = None
+
+if django is not None:
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            INSTALLED_APPS=['django.contrib.contenttypes'],
+            DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+            USE_TZ=False,
+        )
+        django.setup()
+
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from client_bank_exchange_1c.django_client_bank_exchange_1c import BulkResult, DjangoDocument
+
+    class SavedDocument(DjangoDocument):
+        class Meta:
+            app_label = 'contenttypes'
+
+
+def make_document(number: str, amount: str = '100.00', purpose: str = 'Оплата') -> Document:
+    return Document(
+        document_type='Платежное поручение',
+        number=number,
+        date=date(2018, 1, 15),
+        amount=Decimal(amount),
+        payer=Payer(account='40702810900000000001', name='ООО Плательщик', inn='7707083893'),
+        receiver=Receiver(account='40702810900000000002', name='ООО Получатель', inn='7736207543'),
+        payment=Payment(code='0', purpose=purpose),
+    )
+
+
+@unittest.skipUnless(django, 'Django не установлен')
+class DjangoDocumentTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        with connection.schema_editor() as editor:
+            editor.create_model(SavedDocument)
+
+    @classmethod
+    def tearDownClass(cls):
+        with connection.schema_editor() as editor:
+            editor.delete_model(SavedDocument)
+        super().tearDownClass()
+
+    def tearDown(self):
+        SavedDocument.objects.all().delete()
+
+    def test_bulk_from_documents(self):
+        documents = (make_document(str(number)) for number in range(5))
+        with CaptureQueriesContext(connection) as queries:
+            result = SavedDocument.bulk_from_documents(documents, batch_size=2)
+        self.assertIsInstance(result, BulkResult)
+        self.assertEqual(result.count, 5)
+        self.assertGreaterEqual(result.seconds, 0)
+        self.assertGreaterEqual(result.per_second, 0)
+        # Три пачки (2 + 2 + 1) - три INSERT
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(sorted(SavedDocument.objects.values_list('number', flat=True)), [0, 1, 2, 3, 4])
+
+    def test_bulk_from_documents_extra(self):
+        SavedDocument.bulk_from_documents([make_document('1'), make_document('2')], payment_purpose='Общее')
+        self.assertEqual(set(SavedDocument.objects.values_list('payment_purpose', flat=True)), {'Общее'})
+
+    def test_bulk_from_documents_rollback(self):
+        def documents():
+            for number in range(3):
+                yield make_document(str(number))
+            raise ValueError('Ошибка чтения')
+
+        with self.assertRaises(ValueError):
+            SavedDocument.bulk_from_documents(documents(), batch_size=2)
+        # Первая пачка уже была сохранена, но откатывается вместе с транзакцией
+        self.assertEqual(SavedDocument.objects.count(), 0)
+
+    def test_bulk_sync_documents_duplicates_in_batch(self):
+        documents = [
+            make_document('1', purpose='Первая выгрузка'),
+            make_document('2'),
+            make_document('1', purpose='Повторная выгрузка'),
+        ]
+        result = SavedDocument.bulk_sync_documents(documents, batch_size=10)
+        self.assertEqual((result.created, result.updated, result.unchanged, result.duplicates), (2, 0, 0, 1))
+        self.assertEqual(result.created + result.updated + result.unchanged + result.duplicates, len(documents))
+        self.assertEqual(SavedDocument.objects.count(), 2)
+        # Сохраняется последний документ с ключом
+        self.assertEqual(SavedDocument.objects.get(number='1').payment_purpose, 'Повторная выгрузка')
+
+    def test_bulk_sync_documents_duplicates_across_batches(self):
+        documents = [make_document('1', purpose='Первая выгрузка'), make_document('1', purpose='Повторная выгрузка')]
+        result = SavedDocument.bulk_sync_documents(documents, batch_size=1)
+        self.assertEqual((result.created, result.updated, result.unchanged, result.duplicates), (1, 1, 0, 0))
+        self.assertEqual(SavedDocument.objects.get().payment_purpose, 'Повторная выгрузка')
+
+    def test_bulk_sync_documents_repeated_import(self):
+        documents = [make_document(str(number)) for number in range(5)]
+        SavedDocument.bulk_sync_documents(documents, batch_size=2)
+        documents.append(make_document('5'))
+        documents.append(make_document('5'))
+        result = SavedDocument.bulk_sync_documents(documents, batch_size=10)
+        self.assertEqual((result.created, result.updated, result.unchanged, result.duplicates), (1, 0, 5, 1))
+        self.assertEqual(SavedDocument.objects.count(), 6)
+
+    def test_bulk_sync_documents_projected(self):
+        SavedDocument.bulk_sync_documents([make_document('1', purpose='Оплата по счету 1')])
+        text = make_document('1', amount='100.00', purpose='Оплата по счету 1').to_text(validate=False)
+        fields = Document.NATURAL_KEY + ('payer.inn',)
+        for document_cls in (Document, LazyDocument):
+            with self.subTest(document_cls=document_cls.__name__):
+                document = document_cls.from_section_text(text, frozenset(fields))
+                result = SavedDocument.bulk_sync_documents([document], fields=fields)
+                self.assertEqual((result.created, result.updated, result.unchanged), (0, 0, 1))
+                saved = SavedDocument.objects.get()
+                # Поля вне fields не затираются
+                self.assertEqual(saved.payment_purpose, 'Оплата по счету 1')
+                self.assertEqual(saved.payer_name, 'ООО Плательщик')
+                self.assertEqual(saved.receiver_inn, '7736207543')
+
+        document = LazyDocument.from_section_text(text.replace('ПлательщикИНН=7707083893', 'ПлательщикИНН=7702070139'),
+                                                  frozenset(fields))
+        result = SavedDocument.bulk_sync_documents([document], fields=fields)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 0))
+        saved = SavedDocument.objects.get()
+        self.assertEqual(saved.payer_inn, '7702070139')
+        self.assertEqual(saved.payment_purpose, 'Оплата по счету 1')
+
+        # Следующий полный импорт снова сравнивает все поля
+        result = SavedDocument.bulk_sync_documents([make_document('1', purpose='Оплата по счету 1')])
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 0))
+        self.assertEqual(SavedDocument.objects.get().payer_inn, '7707083893')
+
+    def test_bulk_sync_documents_projected_without_fields(self):
+        text = make_document('1').to_text(validate=False)
+        document = LazyDocument.from_section_text(text, frozenset(Document.NATURAL_KEY))
+        with self.assertRaises(ValueError):
+            SavedDocument.bulk_sync_documents([document])
+        with self.assertRaises(ValueError):
+            SavedDocument.bulk_sync_documents([document], fields=['number', 'payment.purpose'])
+        self.assertEqual(SavedDocument.objects.count(), 0)
+
+    def test_bulk_sync_documents_updates_changed_columns(self):
+        SavedDocument.bulk_sync_documents([make_document(str(number)) for number in range(3)])
+        result = SavedDocument.bulk_sync_documents(
+            [make_document('0'), make_document('1', purpose='Исправленное назначение'), make_document('2')]
+        )
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 2))
+        self.assertEqual(SavedDocument.objects.get(number='1').payment_purpose, 'Исправленное назначение')
+        self.assertEqual(SavedDocument.objects.get(number='1').payer_name, 'ООО Плательщик')
+
+    def test_to_document_round_trip(self):
+        document = make_document('1')
+        document.receiver.date_received = '16.01.2018'
+        document.payer.date_charged = date(2018, 1, 15)
+        SavedDocument.bulk_from_documents([document])
+        saved = SavedDocument.objects.get()
+        self.assertEqual(saved.receiver_date_received, date(2018, 1, 16))
+
+        restored = saved.to_document()
+        self.assertEqual(restored.receiver.date_received, '16.01.2018')
+        self.assertIn('ДатаПоступило=16.01.2018', restored.to_text(validate=False))
+        self.assertEqual(SavedDocument.from_document(restored).receiver_date_received, date(2018, 1, 16))
+
+    def test_to_document_without_date_received(self):
+        SavedDocument.bulk_from_documents([make_document('1')])
+        self.assertIsNone(SavedDocument.objects.get().to_document().receiver.date_received)
+
+
+if __name__ == '__main__':
+    unittest.main()
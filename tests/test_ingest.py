@@ -0,0 +1,63 @@
+"""
+Пакетный разбор ingest: аварийное завершение процесса пула не прерывает разбор остальных файлов
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from client_bank_exchange_1c import ingest
+from client_bank_exchange_1c.ingest import parse_file
+
+from tests.test_structure import STATEMENT_TEXT
+
+CRASH_FILENAME = 'crash.txt'
+
+
+def parse_file_or_crash(filename, lazy=False, fields=None):
+    # Как процесс, убитый при нехватке памяти: выход без исключения и без ответа пулу
+    if os.path.basename(filename) == CRASH_FILENAME:
+        os._exit(1)
+    return parse_file(filename, lazy, fields)
+
+
+class IngestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        for name in ('a.txt', 'b.txt', CRASH_FILENAME, 'd.txt', 'e.txt'):
+            with open(os.path.join(self.directory, name), 'w', encoding='cp1251') as file:
+                file.write(STATEMENT_TEXT)
+
+    def test_workers(self):
+        results = list(ingest.ingest(self.directory, workers=2))
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all(result.ok for result in results))
+
+    def test_broken_pool(self):
+        progress = []
+        with mock.patch.object(ingest, 'parse_file', parse_file_or_crash):
+            # По одному файлу в работе, чтобы аварийное завершение затрагивало только crash.txt
+            results = list(ingest.ingest(self.directory, workers=2, max_in_flight=1,
+                                         progress=lambda done, total, result: progress.append((done, total))))
+
+        by_name = {os.path.basename(result.filename): result for result in results}
+        self.assertEqual(sorted(by_name), ['a.txt', 'b.txt', CRASH_FILENAME, 'd.txt', 'e.txt'])
+        self.assertFalse(by_name[CRASH_FILENAME].ok)
+        self.assertTrue(by_name[CRASH_FILENAME].error.startswith('BrokenProcessPool'))
+        # Файлы после аварии разобраны новым пулом
+        for name in ('a.txt', 'b.txt', 'd.txt', 'e.txt'):
+            self.assertTrue(by_name[name].ok, by_name[name].error)
+            self.assertEqual(by_name[name].statement.count(), by_name['a.txt'].statement.count())
+        self.assertEqual(progress, [(done, 5) for done in range(1, 6)])
+
+    def test_broken_pool_in_flight(self):
+        with mock.patch.object(ingest, 'parse_file', parse_file_or_crash):
+            results = list(ingest.ingest(self.directory, workers=2, max_in_flight=4))
+
+        # Файлы, бывшие в работе вместе с crash.txt, могут быть отданы с ошибкой, но ни один не потерян
+        self.assertEqual(sorted(os.path.basename(result.filename) for result in results),
+                         ['a.txt', 'b.txt', CRASH_FILENAME, 'd.txt', 'e.txt'])
+        self.assertFalse(next(result for result in results if result.filename.endswith(CRASH_FILENAME)).ok)
@@ -0,0 +1,92 @@
+"""
+Статистика разбора instrument(): сборщик привязан к потоку
+"""
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from client_bank_exchange_1c import Statement, instrument
+from client_bank_exchange_1c.asyncio_client_bank_exchange_1c import read_file
+
+from tests.test_structure import STATEMENT_TEXT
+
+
+def parse_in_thread(before=None, after=None):
+    def run():
+        if before is not None:
+            before.wait()
+        Statement.from_text(STATEMENT_TEXT)
+        if after is not None:
+            after.set()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+class InstrumentTestCase(unittest.TestCase):
+
+    def test_counts_only_current_thread(self):
+        started, parsed = threading.Event(), threading.Event()
+        thread = parse_in_thread(started, parsed)
+        with instrument() as stats:
+            started.set()
+            parsed.wait()
+            Statement.from_text(STATEMENT_TEXT)
+        thread.join()
+        # Документы, разобранные другим потоком во время блока with, не учитываются
+        self.assertEqual(stats.counters['sections.document'], 2)
+        self.assertEqual(stats.calls['statement.from_text'], 1)
+
+    def test_nested_in_threads(self):
+        other_entered, main_entered, other_exited = threading.Event(), threading.Event(), threading.Event()
+        results = {}
+
+        def other():
+            with instrument() as stats:
+                other_entered.set()
+                main_entered.wait()
+            results['other'] = stats
+            other_exited.set()
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        other_entered.wait()
+        with instrument() as stats:
+            main_entered.set()
+            # Другой поток выходит из своего блока, пока этот поток внутри своего
+            other_exited.wait()
+            Statement.from_text(STATEMENT_TEXT)
+        thread.join()
+        self.assertEqual(stats.calls['statement.from_text'], 1)
+        self.assertEqual(results['other'].calls, {})
+
+        # После выхода из блоков сбор выключен
+        Statement.from_text(STATEMENT_TEXT)
+        self.assertEqual(stats.calls['statement.from_text'], 1)
+        self.assertEqual(results['other'].calls, {})
+
+    def test_async_reader_thread_pool(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'statement.txt')
+            with open(filename, 'w', encoding='cp1251') as file:
+                file.write(STATEMENT_TEXT)
+            loop = asyncio.new_event_loop()
+            try:
+                with instrument() as stats:
+                    statement = loop.run_until_complete(read_file(filename))
+            finally:
+                loop.close()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(statement.documents), 2)
+        # Документы разобраны в пуле потоков цикла событий, но учтены в сборщике вызывающего потока
+        self.assertEqual(stats.counters['fields.Document'], 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+Ленивые документы: pickle для пулов процессов
+"""
+import pickle
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from client_bank_exchange_1c import Document, LazyDocument, Payer, Payment, Receiver
+
+DOCUMENT_TEXT = Document(
+    document_type='Платежное поручение',
+    number='15',
+    date=date(2018, 1, 15),
+    amount=Decimal('100.00'),
+    payer=Payer(account='40702810900000000001', name='ООО Плательщик', inn='7707083893'),
+    receiver=Receiver(account='40702810900000000002', name='ООО Получатель', inn='7736207543'),
+    payment=Payment(code='0', purpose='Оплата по счету 15'),
+).to_text(validate=False)
+
+
+class LazyDocumentPickleTestCase(unittest.TestCase):
+
+    def test_unparsed(self):
+        document = LazyDocument.from_section_text(DOCUMENT_TEXT)
+        restored = pickle.loads(pickle.dumps(document))
+        # Исходный документ не разбирается при упаковке
+        self.assertEqual(document._section_text, DOCUMENT_TEXT)
+        self.assertFalse(hasattr(document, '_found'))
+        self.assertIsInstance(restored, LazyDocument)
+        self.assertEqual(restored.to_text(validate=False), Document.from_section_text(DOCUMENT_TEXT).to_text(False))
+
+    def test_parsed_and_changed(self):
+        document = LazyDocument.from_section_text(DOCUMENT_TEXT)
+        self.assertEqual(document.payer.inn, '7707083893')
+        document.number = '16'
+        restored = pickle.loads(pickle.dumps(document))
+        self.assertEqual(restored.number, '16')
+        self.assertEqual(restored.payer.inn, '7707083893')
+        self.assertEqual(restored.payment.purpose, 'Оплата по счету 15')
+
+    def test_projection(self):
+        fields = frozenset({'number', 'payer.inn'})
+        document = LazyDocument.from_section_text(DOCUMENT_TEXT, fields)
+        restored = pickle.loads(pickle.dumps(document))
+        self.assertEqual(restored._projection.fields, document._projection.fields)
+        self.assertEqual((restored.number, restored.payer.inn), ('15', '7707083893'))
+        self.assertIsNone(restored.amount)
+        self.assertIsNone(restored.payer.name)
+        self.assertIsNone(restored.receiver)
+
+
+if __name__ == '__main__':
+    unittest.main()
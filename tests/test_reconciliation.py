@@ -0,0 +1,79 @@
+"""
+Сверка документов выписки с секциями остатков
+"""
+import unittest
+from datetime import date
+from decimal import Decimal
+
+from client_bank_exchange_1c import Balance, Document, Header, Payer, Receiver, Statement
+from client_bank_exchange_1c.reconciliation import EXPENSE, INCOME, StatementAggregator, reconcile
+
+ACCOUNT = '40702810900000000001'
+OTHER_ACCOUNT = '40702810900000000002'
+
+
+def make_document(number: str, document_date: date, amount: str, payer_account: str, receiver_account: str,
+                  date_charged: date = None, date_received: str = None) -> Document:
+    return Document(
+        document_type='Платежное поручение',
+        number=number,
+        date=document_date,
+        amount=Decimal(amount),
+        payer=Payer(account=payer_account, date_charged=date_charged),
+        receiver=Receiver(account=receiver_account, date_received=date_received),
+    )
+
+
+def make_statement(documents) -> Statement:
+    balance = Balance(
+        date_since=date(2018, 1, 1), date_till=date(2018, 1, 31), account_number=ACCOUNT,
+        initial_balance=Decimal('1000.00'), total_income=Decimal('500.00'), total_expense=Decimal('200.00'),
+        final_balance=Decimal('1300.00'),
+    )
+    return Statement(header=Header(), balances=[balance], documents=documents)
+
+
+class ReconciliationTestCase(unittest.TestCase):
+
+    def test_money_movement_dates(self):
+        statement = make_statement([
+            # Документ прошлого года, деньги поступили в периоде выписки
+            make_document('1', date(2017, 12, 29), '500.00', OTHER_ACCOUNT, ACCOUNT, date_received='01.01.2018'),
+            # Документ прошлого года, списан в периоде выписки
+            make_document('2', date(2017, 12, 31), '200.00', ACCOUNT, OTHER_ACCOUNT, date_charged=date(2018, 1, 10)),
+            # Документ периода выписки, поступление до периода
+            make_document('3', date(2018, 1, 9), '999.00', OTHER_ACCOUNT, ACCOUNT, date_received='30.12.2017'),
+        ])
+        self.assertEqual(reconcile(statement), [])
+
+    def test_document_date_fallback(self):
+        statement = make_statement([
+            make_document('1', date(2018, 1, 15), '500.00', OTHER_ACCOUNT, ACCOUNT),
+            make_document('2', date(2018, 1, 20), '200.00', ACCOUNT, OTHER_ACCOUNT),
+        ])
+        self.assertEqual(reconcile(statement), [])
+
+        aggregator = StatementAggregator().update(statement.documents)
+        self.assertEqual(list(aggregator.by_day(ACCOUNT)), [date(2018, 1, 15), date(2018, 1, 20)])
+
+    def test_mismatch(self):
+        statement = make_statement([
+            make_document('1', date(2018, 1, 15), '400.00', OTHER_ACCOUNT, ACCOUNT, date_received='15.01.2018'),
+        ])
+        self.assertEqual(
+            [(mismatch.attr, mismatch.actual) for mismatch in reconcile(statement)],
+            [('total_income', Decimal('400.00')), ('total_expense', Decimal('0.00')),
+             ('final_balance', Decimal('1400.00'))],
+        )
+
+    def test_totals_by_direction(self):
+        aggregator = StatementAggregator().update([
+            make_document('1', date(2017, 12, 29), '500.00', OTHER_ACCOUNT, ACCOUNT,
+                          date_charged=date(2017, 12, 29), date_received='01.01.2018'),
+        ])
+        self.assertEqual(aggregator.get_totals(ACCOUNT, INCOME, date(2018, 1, 1)).amount, Decimal('500.00'))
+        self.assertEqual(aggregator.get_totals(OTHER_ACCOUNT, EXPENSE, date_till=date(2017, 12, 31)).count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
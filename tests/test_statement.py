@@ -0,0 +1,143 @@
+"""
+Разбор и запись сгенерированной выписки: побайтовое совпадение и одинаковые документы на всех путях разбора
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from client_bank_exchange_1c import Document, LazyDocument, Statement
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+from generate_statement import StatementGenerator  # noqa: E402
+
+FIELDS = ('number', 'date', 'amount', 'payer.inn', 'payer.account', 'receiver', 'payment.purpose')
+
+
+def get_values(document: Document) -> list:
+    """Значения полей документа и его подсекций в порядке схем, подсекция - None или список значений"""
+    values = [getattr(document, field.attr) for field in Document.fields]
+    for name, section in Document.Subsections.to_dict().items():
+        obj = getattr(document, name)
+        values.append(None if obj is None else [getattr(obj, field.attr) for field in section.fields])
+    return values
+
+
+def get_projected_values(document: Document, fields) -> list:
+    """Значения документа после разбора с fields: поля вне проекции равны None"""
+    projection = Document.get_projection(frozenset(fields))
+    selected = {name: {field.attr for field in section_fields} for name, section_fields in projection.fields.items()}
+    values = [getattr(document, field.attr) if field.attr in selected[None] else None for field in Document.fields]
+    for name, section in Document.Subsections.to_dict().items():
+        obj = getattr(document, name)
+        if name not in selected or obj is None:
+            values.append(None)
+        else:
+            values.append([getattr(obj, field.attr) if field.attr in selected[name] else None
+                           for field in section.fields])
+    return values
+
+
+class StatementRoundTripTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        cls.filename = os.path.join(cls.directory, 'statement.txt')
+        generated = os.path.join(cls.directory, 'generated.txt')
+        StatementGenerator(documents=300, accounts=2, tax_share=0.2, fill_rate=0.5, seed=1).write(generated)
+        # Разобранный документ всегда содержит все подсекции, и пустые выводятся (строки обязательных полей Tax),
+        # поэтому текст генератора приводится к виду, который выдает сама библиотека: он должен воспроизводиться
+        # побайтово при каждом следующем разборе и записи
+        cls.data = Statement.from_file(generated).to_text().encode('cp1251')
+        with open(cls.filename, 'wb') as file:
+            file.write(cls.data)
+        cls.statement = Statement.from_file(cls.filename)
+        cls.expected = [get_values(document) for document in cls.statement.documents]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def assert_documents(self, documents, expected=None):
+        documents = list(documents)
+        self.assertEqual(len(documents), len(self.statement.documents))
+        for position, document in enumerate(documents):
+            values = get_values(document)
+            self.assertEqual(values, (expected or self.expected)[position], f'документ {position}')
+            # Типы значений тоже совпадают: например Decimal, а не str
+            self.assertEqual(list(map(type, values)), list(map(type, (expected or self.expected)[position])))
+
+    def test_to_text(self):
+        self.assertEqual(self.statement.to_text().encode('cp1251'), self.data)
+        # Заголовок с одним видом документа (массив из одного значения) и несколько секций остатков
+        self.assertEqual(self.statement.header.filter_document_types, 'Платежное поручение')
+        self.assertEqual(len(self.statement.balances), 2)
+
+    def test_write_to(self):
+        output = io.BytesIO()
+        self.statement.write_to(output)
+        self.assertEqual(output.getvalue(), self.data)
+
+    def test_parsed_twice(self):
+        statement = Statement.from_text(self.statement.to_text())
+        self.assertEqual(statement.to_text(), self.statement.to_text())
+        self.assert_documents(statement.documents)
+
+    def test_lazy(self):
+        statement = Statement.from_file(self.filename, lazy=True)
+        self.assertTrue(all(isinstance(document, LazyDocument) for document in statement.documents))
+        self.assertEqual(statement.to_text().encode('cp1251'), self.data)
+        self.assert_documents(Statement.from_file(self.filename, lazy=True).documents)
+
+    def test_fields(self):
+        expected = [get_projected_values(document, FIELDS) for document in self.statement.documents]
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                self.assert_documents(Statement.from_file(self.filename, lazy=lazy, fields=FIELDS).documents, expected)
+
+    def test_reader(self):
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                with Statement.iter_documents(self.filename, lazy=lazy) as reader:
+                    self.assert_documents(reader)
+
+    def test_mapped(self):
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                with Statement.map_file(self.filename, lazy=lazy) as statement:
+                    self.assert_documents(statement)
+
+    def test_workers(self):
+        for lazy in (False, True):
+            with self.subTest(lazy=lazy):
+                statement = Statement.from_file(self.filename, workers=2, lazy=lazy)
+                self.assert_documents(statement.documents)
+                self.assertEqual(statement.to_text().encode('cp1251'), self.data)
+
+
+class InternTestCase(unittest.TestCase):
+
+    def test_intern_repeated_fields_only(self):
+        text = (
+            '1CClientBankExchange\nВерсияФормата=1.02\nКодировка=Windows\nОтправитель=Бухгалтерия\n'
+            'ДатаНачала=01.01.2018\nДатаКонца=31.01.2018\nРасчСчет=40702810900000000001\n'
+            'СекцияДокумент=Платежное поручение\nНомер=1\nПлательщикСчет=40702810900000000001\n'
+            'ПлательщикИНН=7707083893\nНазначениеПлатежа=Оплата по счету 1\nКонецДокумента\nКонецФайла\n'
+        )
+        first, second = (Statement.from_text(text).documents[0] for _ in range(2))
+        # Счета и ИНН повторяются в документах и хранятся один раз
+        self.assertIs(first.payer.account, second.payer.account)
+        self.assertIs(first.payer.inn, second.payer.inn)
+        # Назначение платежа и номер уникальны для документа и не интернируются
+        self.assertEqual(first.payment.purpose, second.payment.purpose)
+        self.assertIsNot(first.payment.purpose, second.payment.purpose)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Разбиение файла выписки на секции (SectionSplitter) и ошибки структуры с номером строки
+"""
+import io
+import os
+import pickle
+import tempfile
+import unittest
+
+from client_bank_exchange_1c import Statement, StatementStructureError
+
+STATEMENT_TEXT = '''1CClientBankExchange
+ВерсияФормата=1.02
+Кодировка=Windows
+Отправитель=Бухгалтерия
+Получатель=
+ДатаСоздания=15.01.2018
+ВремяСоздания=10:00:00
+ДатаНачала=01.01.2018
+ДатаКонца=31.01.2018
+РасчСчет=40702810900000000001
+СекцияРасчСчет
+ДатаНачала=01.01.2018
+ДатаКонца=31.01.2018
+РасчСчет=40702810900000000001
+НачальныйОстаток=0.00
+ВсегоПоступило=0.00
+ВсегоСписано=0.00
+КонечныйОстаток=0.00
+КонецРасчСчет
+СекцияДокумент=Платежное поручение
+Номер=1
+Дата=15.01.2018
+Сумма=100.00
+КонецДокумента
+СекцияДокумент=Платежное поручение
+Номер=2
+Дата=15.01.2018
+Сумма=200.00
+КонецДокумента
+КонецФайла
+'''
+
+
+def parse_with_reader(text: str):
+    with Statement.iter_documents(io.StringIO(text)) as reader:
+        return list(reader)
+
+
+def parse_with_mapped(text: str):
+    fd, filename = tempfile.mkstemp(suffix='.txt')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(text.encode('cp1251'))
+        with Statement.map_file(filename) as statement:
+            return list(statement)
+    finally:
+        os.unlink(filename)
+
+
+class SectionSplitterTestCase(unittest.TestCase):
+    # Полный текст, потоковое чтение и mmap делят файл одним автоматом и должны сообщать об одной строке
+    PARSERS = (('from_text', Statement.from_text), ('iter_documents', parse_with_reader),
+               ('map_file', parse_with_mapped))
+
+    def assert_structure_error(self, text: str, line: int, message: str):
+        for name, parse in self.PARSERS:
+            with self.subTest(parser=name):
+                with self.assertRaises(StatementStructureError) as context:
+                    parse(text)
+                self.assertEqual(context.exception.line, line)
+                self.assertEqual(context.exception.message, message)
+                self.assertEqual(str(context.exception), f'{message}, строка {line}')
+
+    def test_valid(self):
+        statement = Statement.from_text(STATEMENT_TEXT)
+        self.assertEqual(len(statement.balances), 1)
+        self.assertEqual([document.number for document in statement.documents], ['1', '2'])
+        for name, parse in self.PARSERS[1:]:
+            with self.subTest(parser=name):
+                self.assertEqual([document.number for document in parse(STATEMENT_TEXT)], ['1', '2'])
+
+    def test_missing_file_end(self):
+        self.assert_structure_error(STATEMENT_TEXT.replace('КонецФайла\n', ''), 29, 'Нет КонецФайла')
+
+    def test_unclosed_section(self):
+        text = STATEMENT_TEXT.replace('Сумма=100.00\nКонецДокумента\n', 'Сумма=100.00\n')
+        self.assert_structure_error(
+            text, 24, 'СекцияДокумент из строки 20 не закрыта КонецДокумента до СекцияДокумент'
+        )
+
+    def test_unclosed_last_section(self):
+        text = STATEMENT_TEXT.replace('Сумма=200.00\nКонецДокумента\n', 'Сумма=200.00\n')
+        self.assert_structure_error(text, 29, 'СекцияДокумент из строки 25 не закрыта КонецДокумента до КонецФайла')
+
+    def test_unclosed_balance(self):
+        text = STATEMENT_TEXT.replace('КонецРасчСчет\n', '')
+        self.assert_structure_error(text, 19, 'СекцияРасчСчет из строки 11 не закрыта КонецРасчСчет до СекцияДокумент')
+
+    def test_stray_end_marker(self):
+        text = STATEMENT_TEXT.replace('КонецФайла', 'КонецДокумента\nКонецФайла')
+        self.assert_structure_error(text, 30, 'КонецДокумента без начала секции')
+
+    def test_marker_not_at_line_start(self):
+        # Маркер не в начале строки не начинает секцию, поэтому ее конец оказывается без начала
+        text = STATEMENT_TEXT.replace('СекцияДокумент=Платежное поручение\nНомер=2',
+                                      ' СекцияДокумент=Платежное поручение\nНомер=2')
+        self.assert_structure_error(text, 29, 'КонецДокумента без начала секции')
+
+    def test_pickle(self):
+        error = StatementStructureError('Нет КонецФайла', 29)
+        restored = pickle.loads(pickle.dumps(error))
+        self.assertEqual((restored.message, restored.line, str(restored)), (error.message, error.line, str(error)))
+
+
+if __name__ == '__main__':
+    unittest.main()